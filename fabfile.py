@@ -22,6 +22,11 @@ update_settings({
                     "./web_src/sass/widgets.scss",
                     "./web_src/bower_components/mdi/scss/materialdesignicons.scss"],
     'css_files':[],
+    'expression_bundle': {
+        'templates':['./web_src/index.html'],
+        'target':'./www/expressions.json',
+        'prefix':'tpl-'
+    },
     'css_asset_dir':'./www/css'
 },'web')
 
@@ -49,6 +49,11 @@ def single(test):
           os.path.join('tests/circular', test)])
     cleanup()
 
+@task
+def bench(name='expression'):
+    venv(['PYTHONPATH=./src/:./tests/brython/ python',
+          '-m tests.benchmarks.bench_'+name])
+
 @task
 def cleanup():
     local('rm -f ./tests/selenium/webroot/tests/*')
@@ -1,2 +1,2 @@
 from stylesheets import buildcss
-from deploy import deploy, serve
+from deploy import deploy, serve, precompile
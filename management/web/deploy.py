@@ -2,6 +2,7 @@ import os, sys
 
 from fabric.api import task
 from management.shell import cpR, stream
+from management.venv import venv
 
 from management.settings import settings
 conf = settings(__package__,strip_leading=1)
@@ -36,10 +37,20 @@ def copy_assets():
         cpR(asset['source'],asset['target'],pattern=asset['pattern'],create_parents=True)
 
 
+@task
+def precompile():
+    bundle = conf.expression_bundle
+    venv(['PYTHONPATH=.:./src/:./tests/brython/ python',
+          'management/web/precompile.py',
+          '--prefix', bundle['prefix'],
+          '-o', bundle['target']] + bundle['templates'])
+
+
 @task
 def deploy():
     buildcss()
     copy_assets()
+    precompile()
     
 @task
 def serve():
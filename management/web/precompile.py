@@ -0,0 +1,92 @@
+"""
+    Scans html templates for circular expressions (``{{ }}`` interpolations
+    and the arguments of the ``for``, ``model`` and ``click`` plugins) and
+    writes their parsed ASTs into a json bundle which can be loaded in the
+    browser using :func:`circular.template.expression.load_bundle`.
+
+    Usage:
+
+        PYTHONPATH=.:./src/:./tests/brython/ python management/web/precompile.py [--prefix tpl-] -o bundle.json template.html ...
+
+    (the ``circular.template`` package imports the ``browser`` module, so the
+    mock from ``tests/brython`` needs to be on the path) or, using fabric,
+
+        fab web.precompile
+"""
+import argparse
+import json
+import sys
+
+from html.parser import HTMLParser
+
+from circular.template.expression import build_bundle, parse
+from circular.template.tags.For import For
+from circular.template.tpl import PrefixLookupDict
+
+# Plugins whose argument is a plain expression
+EXPRESSION_PLUGINS = ['MODEL', 'CLICK']
+
+
+class TemplateScanner(HTMLParser):
+    """
+        Collects the expressions (as ``(expr, trailing_garbage_ok)`` pairs)
+        and interpolated strings found in the fed html.
+    """
+
+    def __init__(self, prefix=''):
+        super().__init__()
+        # Maps the (prefixed) plugin attribute names to the plugins
+        self.plugins = PrefixLookupDict(['FOR'] + EXPRESSION_PLUGINS)
+        self.plugins.set_prefix(prefix)
+        self.expressions = set()
+        self.interpolated_strs = set()
+
+    def handle_starttag(self, tag, attrs):
+        for (name, value) in attrs:
+            if value is None:
+                continue
+            plugin = self.plugins[name] if name in self.plugins else None
+            if plugin == 'FOR':
+                self.add_loop_spec(value)
+            elif plugin in EXPRESSION_PLUGINS:
+                self.expressions.add((value, False))
+            elif '{{' in value:
+                self.interpolated_strs.add(value)
+
+    def handle_data(self, data):
+        if '{{' in data:
+            self.interpolated_strs.add(data)
+
+    def add_loop_spec(self, loop_spec):
+        match = For.SPEC_RE.match(loop_spec)
+        if match is None:
+            return
+        sequence_exp = match.group('sequence_exp')
+        self.expressions.add((sequence_exp, True))
+        _ast, pos = parse(sequence_exp, trailing_garbage_ok=True, use_cache=False)
+        match = For.COND_RE.match(sequence_exp[pos:])
+        if match:
+            self.expressions.add((match.group('condition'), False))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Precompile circular template expressions into a json bundle")
+    parser.add_argument('templates', nargs='+', help="the html templates to scan")
+    parser.add_argument('-o', '--output', required=True, help="the file to write the bundle to")
+    parser.add_argument('--prefix', default='', help="the plugin prefix (see circular.template.set_prefix)")
+    args = parser.parse_args(argv)
+
+    scanner = TemplateScanner(args.prefix)
+    for template in args.templates:
+        with open(template, 'r') as tpl:
+            scanner.feed(tpl.read())
+    scanner.close()
+
+    bundle = build_bundle(sorted(scanner.expressions), sorted(scanner.interpolated_strs))
+    with open(args.output, 'w') as out:
+        json.dump(bundle, out, separators=(',', ':'))
+    print("Precompiled", len(bundle['entries']), "expressions into", args.output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,9 @@
+AVAILABLE = False
+
+
+def eval_comprehension(expr, cond, items, with_mask=False):
+    """
+        Vectorized evaluation is not available in the browser, the caller
+        always falls back to evaluating the comprehension element by element.
+    """
+    return None
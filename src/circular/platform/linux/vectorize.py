@@ -0,0 +1,171 @@
+"""
+    A NumPy backend evaluating comprehensions like
+
+    ```
+        [x*scale for x in samples if x % 2 == 0]
+    ```
+
+    as array operations. The expression and the condition are passed in as
+    simple programs (nested tuples) over the loop variable:
+
+    ```
+        ('var',)                    the loop variable
+        ('const', value)            an int or float constant
+        ('neg', arg)                unary minus
+        ('op', operator, lhs, rhs)  one of the :data:`BINARY_OPS` operators
+    ```
+
+    If NumPy is not installed or the computation cannot be done exactly as
+    Python would do it (non-numeric items, possible integer overflow, division
+    by zero, ...), :func:`eval_comprehension` returns ``None`` and the caller
+    evaluates the comprehension element by element.
+"""
+import array
+
+try:
+    import numpy
+    AVAILABLE = True
+except ImportError:
+    numpy = None
+    AVAILABLE = False
+
+# Integers are only handled while their magnitude is below this limit
+# so that int64 arithmetic never overflows and conversions to float are exact
+INT_LIMIT = 2**53
+
+if AVAILABLE:
+    BINARY_OPS = {
+        '+': numpy.add,
+        '-': numpy.subtract,
+        '*': numpy.multiply,
+        '/': numpy.true_divide,
+        '//': numpy.floor_divide,
+        '%': numpy.remainder,
+        '**': numpy.power,
+        '==': numpy.equal,
+        '!=': numpy.not_equal,
+        '<': numpy.less,
+        '>': numpy.greater,
+        '<=': numpy.less_equal,
+        '>=': numpy.greater_equal,
+    }
+else:
+    BINARY_OPS = {}
+
+COMPARISONS = ['==', '!=', '<', '>', '<=', '>=']
+
+# The ``array.array`` typecodes whose items may not fit into an int64 (or,
+# for unicode characters, are not numbers) and are converted item by item
+UNBUFFERED_TYPECODES = ['u', 'w', 'L', 'Q']
+
+
+class Unsupported(Exception):
+    """
+        Raised when a program can not be evaluated exactly using NumPy.
+    """
+    pass
+
+
+def _to_array(items):
+    """
+        Converts :param:`items` into an int64 or float64 array. The items
+        must all be ints or all be floats (bools are not converted).
+        The contents of an ``array.array`` are used without boxing them.
+    """
+    if isinstance(items, array.array) and items.typecode not in UNBUFFERED_TYPECODES:
+        if not items:
+            raise Unsupported()
+        ret = numpy.frombuffer(items, dtype=items.typecode)
+        ret = ret.astype(numpy.float64 if ret.dtype.kind == 'f' else numpy.int64)
+        _bound(ret)
+        return ret
+    items = list(items)
+    if not items:
+        raise Unsupported()
+    kind = type(items[0])
+    if kind not in (int, float) or any(type(item) is not kind for item in items):
+        raise Unsupported()
+    ret = numpy.array(items, dtype=numpy.int64 if kind is int else numpy.float64)
+    _bound(ret)
+    return ret
+
+
+def _bound(val):
+    """
+        Returns the maximal magnitude of the integer valued :param:`val` or
+        ``None`` if :param:`val` is a float. Raises :class:`Unsupported` for
+        other values and integers which are too large.
+    """
+    kind = val.dtype.kind
+    if kind == 'f':
+        return None
+    if kind != 'i':
+        raise Unsupported()
+    ret = int(numpy.abs(val).max()) if val.size else 0
+    if ret >= INT_LIMIT:
+        raise Unsupported()
+    return ret
+
+
+def _operand(val):
+    val = numpy.asarray(val)
+    if val.dtype.kind == 'b':
+        # Python treats booleans as integers in arithmetic
+        return val.astype(numpy.int64)
+    return val
+
+
+def _apply(operator, lhs, rhs):
+    if operator in COMPARISONS:
+        return BINARY_OPS[operator](lhs, rhs)
+    lhs, rhs = _operand(lhs), _operand(rhs)
+    lbound, rbound = _bound(lhs), _bound(rhs)
+    if lbound is not None and rbound is not None:
+        if operator in ['+', '-'] and lbound + rbound >= INT_LIMIT:
+            raise Unsupported()
+        if operator == '*' and lbound * rbound >= INT_LIMIT:
+            raise Unsupported()
+        if operator == '**':
+            # int ** int is either an int or (for negative exponents) a float in Python
+            raise Unsupported()
+    return BINARY_OPS[operator](lhs, rhs)
+
+
+def _run(program, arr):
+    kind = program[0]
+    if kind == 'var':
+        return arr
+    elif kind == 'const':
+        val = numpy.asarray(program[1])
+        _bound(val)
+        return val
+    elif kind == 'neg':
+        return numpy.negative(_operand(_run(program[1], arr)))
+    elif kind == 'op':
+        return _apply(program[1], _run(program[2], arr), _run(program[3], arr))
+    raise Unsupported()
+
+
+def eval_comprehension(expr, cond, items, with_mask=False):
+    """
+        Computes ``[expr for var in items if cond]``, where :param:`expr` and
+        :param:`cond` are programs (see the module documentation), :param:`cond`
+        being optional. Returns the resulting list or ``None`` if the
+        comprehension cannot be evaluated using NumPy. If :param:`with_mask`
+        is ``True``, returns a pair consisting of the resulting list and a list
+        of booleans indicating which items satisfy the condition.
+    """
+    if not AVAILABLE:
+        return None
+    try:
+        with numpy.errstate(all='raise'):
+            arr = _to_array(items)
+            if cond is not None:
+                mask = numpy.broadcast_to(_run(cond, arr), arr.shape).astype(bool)
+                arr = arr[mask]
+            ret = numpy.broadcast_to(_run(expr, arr), arr.shape).tolist()
+            if with_mask:
+                return ret, [True] * len(ret) if cond is None else mask.tolist()
+            return ret
+    except (Unsupported, ArithmeticError, TypeError, ValueError):
+        return None
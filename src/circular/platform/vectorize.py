@@ -0,0 +1,12 @@
+"""
+    Vectorized evaluation of simple numeric comprehensions (see
+    :func:`eval_comprehension`). On Linux, this uses NumPy when it
+    is available; in the browser the comprehensions are always
+    evaluated element by element.
+"""
+import sys
+
+if sys.platform == "brython":
+    from .brython.vectorize import *
+else:
+    from .linux.vectorize import *
@@ -4,8 +4,55 @@
 """
 
 import asyncio
+import weakref
+from collections import OrderedDict
+from types import MappingProxyType
 
-from .observer import ListProxy, DictProxy
+from circular.utils.events import Event, weak_handler
+
+from .observer import ListProxy, DictProxy, batch, observe, _emit_change, _proxy
+
+# Maps variable names to the number of times a variable with the name was
+# added to (or removed from) a context. Used to invalidate the scope
+# resolution caches of the contexts (see :meth:`Context._get`).
+_SCOPE_VERSIONS = {}
+
+
+def _scope_changed(name):
+    _SCOPE_VERSIONS[name] = _SCOPE_VERSIONS.get(name, 0) + 1
+
+
+def _is_awaitable(val):
+    return asyncio.iscoroutine(val) or isinstance(val, asyncio.Future)
+
+
+def _value_type(val):
+    """
+        Returns the type of :param:`val`, not distinguishing between
+        lists (dicts) and their proxies.
+    """
+    if isinstance(val, ListProxy):
+        return list
+    if isinstance(val, DictProxy):
+        return dict
+    return type(val)
+
+
+def _same(old, new):
+    """
+        Returns ``True`` if :param:`new` is :param:`old` or a value of
+        the same type which equals it (so that e.g. ``1`` and ``True``
+        or ``1.0`` are considered different).
+    """
+    if old is new:
+        return True
+    if _value_type(old) is not _value_type(new):
+        return False
+    try:
+        return bool(old == new)
+    # pylint: disable=broad-except; comparing arbitrary values can fail in arbitrary ways (e.g. numpy arrays)
+    except Exception:
+        return False
 
 
 class Context(object):
@@ -34,8 +81,41 @@ class Context(object):
             assert ch.a == 30, "Child cannot modify base scope"
         ```
 
+        Changes to the variables can be observed either by observing the
+        context (see :func:`observe`), which reports changes to all variables,
+        or by watching a single variable (see :meth:`_watch`), e.g.:
+
+        ```
+            ctx._watch('a', lambda event: print("New a:", event.data['value']))
+        ```
+
+        Assigning a coroutine (or a future) to a variable sets the variable to
+        its result once it is available. To load several values at once, so that
+        the templates are updated only once, use :meth:`_load`, e.g.:
+
+        ```
+            ctx._load({'user': fetch_user(), 'posts': fetch_posts()}, timeout=5, placeholders={'posts': []})
+        ```
+
+        A snapshot of the variables (see :meth:`_snapshot`) can be taken
+        cheaply and restored using :meth:`_replace`, which only changes
+        the variables whose values differ, e.g.:
+
+        ```
+            saved = ctx._snapshot()
+            ctx.a = 30
+            ctx._replace(saved)
+        ```
+
+        The snapshot is shallow: it records which values the variables
+        have, not their contents, so in-place changes to a list or a dict
+        (e.g. ``ctx.l.append(4)``) are seen by the snapshot as well
+        and are not undone by restoring it.
+
         WARNING: Only use it to store variables not starting with ``_``.
     """
+    # The ``_obs____`` and ``_orig_class`` slots are used when the context is observed
+    __slots__ = ['_base', '_dct', '_shared', '_saved', '_scope_cache', '_watchers', '_obs____', '_orig_class', '__weakref__']
 
     def __init__(self, dct=None, base=None):
         """
@@ -48,22 +128,88 @@ class Context(object):
             self._dct = {}
         else:
             self._dct = dct.copy()
+        # Whether ``_dct`` is shared with a snapshot (see :meth:`_snapshot`)
+        self._shared = False
         self._saved = {}
+        # Maps variable names looked up in the base scopes to pairs
+        # (the version of the name, the dict containing the variable)
+        self._scope_cache = {}
+        # Maps variable names to the handlers watching them (see :meth:`_watch`)
+        self._watchers = {}
 
     def reset(self, dct):
         """
             Clears the current context and for initializes it with
-            the content of :param:`dct`.
-        """
-        keys = list(self._dct.keys())
-        for k in keys:
-            delattr(self, k)
-        if isinstance(dct, dict):
-            for k in dct.keys():
-                setattr(self, k, dct[k])
-        elif isinstance(dct, Context):
-            for k in dct._dct.keys():
-                setattr(self, k, getattr(dct, k))
+            the content of :param:`dct` (a dict, a :class:`Context`
+            or a snapshot). See :meth:`_replace`.
+        """
+        self._replace(dct)
+
+    def _snapshot(self):
+        """
+            Returns a read-only mapping of the variables of the context as they
+            are now. The mapping shares the dict of variables with the context
+            until the context is changed, so taking a snapshot does not copy
+            anything (the first change afterwards does).
+
+            The snapshot is shallow: lists and dicts are shared with the context,
+            so changing them in place changes the snapshot too. Assign a copy
+            to the variable instead if the snapshot should keep the old contents.
+        """
+        self._shared = True
+        return MappingProxyType(self._dct)
+
+    def _own(self):
+        """
+            Copies the dict of variables before it is changed,
+            if it is shared with a snapshot.
+        """
+        if self._shared:
+            self._dct = dict(self._dct)
+            self._shared = False
+            # The scope caches of nested contexts refer to the shared dict
+            for name in self._dct:
+                _scope_changed(name)
+
+    def _replace(self, values):
+        """
+            Replaces the variables of the context with the variables in :param:`values`
+            (a dict, a :class:`Context` or a snapshot, see :meth:`_snapshot`).
+
+            Unlike setting the variables one by one, only the variables which are
+            removed or whose values differ are changed and observers of the context
+            get a single (``batch``) change event. Lists and dicts which are already
+            wrapped in proxies (e.g. the values from a snapshot) are not copied; since
+            snapshots are shallow, neither are their contents restored.
+
+            Variables whose new value is a coroutine (or a future) are removed and
+            set to its result once it is available, as when assigning the value.
+        """
+        if isinstance(values, Context):
+            values = {name: values._get(name) for name in values}
+        pending = {name: val for (name, val) in values.items()
+                   if _is_awaitable(val) or asyncio.iscoroutinefunction(val)}
+        self._own()
+        observed = hasattr(self, '_obs____') and self._obs____.has_listeners('change')
+        with batch():
+            for name in [name for name in self._dct if name not in values or name in pending]:
+                old = self._dct.pop(name)
+                _scope_changed(name)
+                if observed:
+                    _emit_change(self, {'observed_obj': self, 'type': '__delattr__', 'key': name, 'old': old})
+            for (name, val) in values.items():
+                if name in pending:
+                    continue
+                if name in self._dct:
+                    if _same(self._dct[name], val):
+                        continue
+                else:
+                    _scope_changed(name)
+                self._dct[name] = _proxy(val)
+                if observed:
+                    _emit_change(self, {'observed_obj': self, 'type': '__setattr__', 'key': name, 'value': val})
+        for (name, val) in pending.items():
+            setattr(self, name, val)
 
     def __iter__(self):
         return iter(self._dct)
@@ -87,11 +233,13 @@ class Context(object):
         if attr.startswith('_'):
             super().__setattr__(attr, val)
         else:
+            self._own()
+            added = attr not in self._dct
             if isinstance(val, list):
                 self._dct[attr] = ListProxy(val)
             elif isinstance(val, dict):
                 self._dct[attr] = DictProxy(val)
-            elif asyncio.iscoroutine(val) or asyncio.iscoroutinefunction(val) or isinstance(val, asyncio.Future):
+            elif _is_awaitable(val) or asyncio.iscoroutinefunction(val):
                 val = asyncio.async(val)
 
                 def set_later(future_val, attr=attr):
@@ -100,12 +248,16 @@ class Context(object):
                 val.add_done_callback(set_later)
             else:
                 self._dct[attr] = val
+            if added and attr in self._dct:
+                _scope_changed(attr)
 
     def __delattr__(self, attr):
         if attr.startswith('_'):
             super().__delattr__(attr)
         else:
+            self._own()
             del self._dct[attr]
+            _scope_changed(attr)
 
     def __repr__(self):
         return repr(self._dct)
@@ -113,14 +265,120 @@ class Context(object):
     def __str__(self):
         return str(self._dct)
 
+    def _load(self, values, timeout=None, placeholders=None):
+        """
+            Resolves the awaitables (coroutines or futures) in the dict :param:`values`
+            concurrently and sets the variables to their results (other values are
+            set as they are). All of the variables are set at once, so observers
+            of the context get a single (``batch``) change event.
+
+            If :param:`timeout` (in seconds) is given, values which take longer
+            to resolve are not set. It can be a number or a dict mapping variable
+            names to their timeouts. The variables in the dict :param:`placeholders`
+            are set immediately and keep their (placeholder) value if their
+            awaitable fails or times out.
+
+            Returns a future whose result is a dict mapping the names of the
+            variables whose awaitable failed (or timed out) to the exception.
+        """
+        with batch():
+            for (name, val) in (placeholders or {}).items():
+                setattr(self, name, val)
+
+        names = list(values.keys())
+        pending = []
+        for name in names:
+            val = values[name]
+            if not _is_awaitable(val):
+                future = asyncio.Future()
+                future.set_result(val)
+                val = future
+            limit = timeout.get(name) if isinstance(timeout, dict) else timeout
+            if limit is not None:
+                val = asyncio.wait_for(val, limit)
+            pending.append(val)
+
+        ret = asyncio.Future()
+
+        def set_results(gathered):
+            if gathered.cancelled():
+                ret.cancel()
+                return
+            errors = {}
+            with batch():
+                for (name, result) in zip(names, gathered.result()):
+                    if isinstance(result, BaseException):
+                        errors[name] = result
+                    else:
+                        setattr(self, name, result)
+            ret.set_result(errors)
+
+        asyncio.gather(*pending, return_exceptions=True).add_done_callback(set_results)
+        return ret
+
     def _get(self, name):
+        """
+            Returns the value of the variable :param:`name` looked up in this
+            context and then in the chain of its base contexts.
+
+            The dict containing a variable found in the base contexts is cached,
+            so that a lookup costs the same regardless of how deeply the contexts
+            are nested. The cache entry is invalidated whenever a variable with
+            the same name is added to or removed from any context (which could
+            shadow or remove the variable); assigning a new value to an existing
+            variable does not invalidate anything.
+        """
         if name in self._dct:
             return self._dct[name]
-        if isinstance(self._base, Context):
-            return self._base._get(name)
-        return self._base[name]
+        return self._get_inherited(name)
+
+    def _lookup(self, name):
+        """
+            Like :meth:`_get`, but always resolves the variable using the scope cache
+            of this context. A :class:`LoopScope` which does not define :param:`name`
+            delegates its lookups to its base using this method, so that the (short
+            lived) scopes of the items of a nested loop share the cache of the scope
+            of the outer item instead of walking the chain of scopes.
+        """
+        return self._get(name)
+
+    def _get_inherited(self, name):
+        """
+            Returns the value of the variable :param:`name` looked up in the chain
+            of the base contexts, using (and updating) the scope resolution cache
+            (see :meth:`_get`).
+        """
+        entry = self._scope_cache.get(name)
+        if entry is not None and entry[0] == _SCOPE_VERSIONS.get(name, 0):
+            return entry[1][name]
+        version = _SCOPE_VERSIONS.get(name, 0)
+        scope = self._base
+        while isinstance(scope, Context):
+            if scope._has_local(name):
+                scope = scope._locals()
+                break
+            scope = scope._base
+        val = scope[name]
+        self._scope_cache[name] = (version, scope)
+        return val
+
+    def _has_local(self, name):
+        """
+            Returns ``True`` if the variable :param:`name` is defined in this
+            context (and not only in one of its bases).
+        """
+        return name in self._dct
+
+    def _locals(self):
+        """
+            Returns the mapping of the variables defined in this context.
+        """
+        return self._dct
 
     def _set(self, name, val):
+        self._own()
+        if name not in self._dct:
+            _scope_changed(name)
         if isinstance(val, list):
             self._dct[name] = ListProxy(val)
         elif isinstance(val, dict):
@@ -129,7 +387,78 @@ class Context(object):
             self._dct[name] = val
 
     def _clear(self):
-        self._dct.clear()
+        for name in self._dct:
+            _scope_changed(name)
+        if self._shared:
+            self._dct = {}
+            self._shared = False
+        else:
+            self._dct.clear()
+
+    def _watch(self, name, handler):
+        """
+            Registers :param:`handler` to be called with the change event
+            whenever the variable :param:`name` is assigned to or deleted.
+            Unlike handlers bound to the observer of the context, the handler
+            is not called for changes to other variables, so the cost of a change
+            is proportional to the number of handlers watching the variable.
+
+            If :param:`handler` is a bound method, the context keeps only a weak
+            reference to its object and unwatches it when the object is garbage
+            collected.
+        """
+        if not self._watchers:
+            self._bind_watchers()
+        if name not in self._watchers:
+            self._watchers[name] = []
+        self_ref = weakref.ref(self)
+
+        def prune(dead_handler):
+            ctx = self_ref()
+            if ctx is not None:
+                ctx._unwatch(name, dead_handler)
+        self._watchers[name].append(weak_handler(handler, prune))
+
+    def _unwatch(self, name, handler):
+        """
+            Unregisters :param:`handler` previously registered by :meth:`_watch`.
+        """
+        handlers = self._watchers.get(name, [])
+        if handler not in handlers:
+            return
+        # Replace the list instead of modifying it, since the handlers
+        # may be in the middle of being notified (see :meth:`_notify_watchers`)
+        index = handlers.index(handler)
+        handlers = handlers[:index] + handlers[index+1:]
+        self._watchers[name] = handlers
+        if not handlers:
+            del self._watchers[name]
+            if not self._watchers:
+                self._unbind_watchers()
+
+    def _bind_watchers(self):
+        """
+            Starts notifying the watchers (see :meth:`_watch`) of the changes
+            to the variables. Called when the first variable is watched.
+        """
+        observe(self).bind('change', self._notify_watchers)
+
+    def _unbind_watchers(self):
+        """
+            Stops notifying the watchers. Called when the last watcher is unwatched.
+        """
+        self._obs____.unbind('change', self._notify_watchers)
+
+    def _notify_watchers(self, event):
+        if event.data['type'] == 'batch':
+            # Notify the watchers of each changed variable once, with its last change
+            changes = OrderedDict((change['key'], change) for change in event.data['events'])
+            for (key, change) in changes.items():
+                if key in self._watchers:
+                    self._notify_watchers(Event('change', event.target, change))
+            return
+        for handler in self._watchers.get(event.data['key'], []):
+            handler(event)
 
     def _save(self, name):
         """ If the identifier @name is present, saves its value on
@@ -144,6 +473,173 @@ class Context(object):
         """ If the identifier @name is present in the saved stack
             restores its value to the last value on the saved stack."""
         if name in self._saved:
+            self._own()
+            if name not in self._dct:
+                _scope_changed(name)
             self._dct[name] = self._saved[name].pop()
             if len(self._saved[name]) == 0:
                 del self._saved[name]
+
+
+class LoopScope(Context):
+    """
+        A compact context holding a single variable (e.g. the loop variable of
+        a :class:`For` loop) and the base context, used instead of a full
+        :class:`Context` when a lot of scopes are needed:
+
+        ```
+            ctx = Context()
+            ctx.rows = [1, 2, 3]
+            scopes = [LoopScope('row', row, ctx) for row in ctx.rows]
+        ```
+
+        It behaves like ``Context({'row': row}, base=ctx)``, but does not
+        create any dicts until another variable is assigned to it (or the
+        variable is deleted or reassigned). Only then is it converted to a
+        full context, which keeps the variables in a dict.
+    """
+    __slots__ = ['_var', '_val']
+
+    def __init__(self, var, val, base):
+        # pylint: disable=super-init-not-called; the state of a full context is created when needed (see _promote)
+        self._var = var
+        self._val = val
+        self._base = base
+        self._dct = None
+        # The scope resolution cache (see :meth:`Context._get`) is only created
+        # when a variable of the base contexts is first looked up (see :meth:`_lookup`)
+        self._scope_cache = None
+        self._watchers = {}
+
+    def _promote(self):
+        """
+            Converts the scope into a full context.
+        """
+        if self._dct is not None:
+            return
+        watchers = self._watchers
+        super().__init__({self._var: self._val}, self._base)
+        self._watchers = watchers
+        if watchers:
+            self._bind_watchers()
+
+    def _has_local(self, name):
+        if self._dct is None:
+            return name == self._var
+        return name in self._dct
+
+    def _locals(self):
+        # While the scope is not promoted, it serves as its own mapping (see :meth:`__getitem__`)
+        if self._dct is None:
+            return self
+        return self._dct
+
+    def __getitem__(self, name):
+        """
+            Returns the value of the variable :param:`name` defined in this
+            scope (this is used by the scope caches of nested contexts).
+        """
+        if self._dct is None:
+            if name == self._var:
+                return self._val
+            raise KeyError(name)
+        return self._dct[name]
+
+    def _get(self, name):
+        if self._dct is None:
+            if name == self._var:
+                return self._val
+            if isinstance(self._base, Context):
+                return self._base._lookup(name)
+            return self._base[name]
+        return super()._get(name)
+
+    def _lookup(self, name):
+        if self._dct is None:
+            if name == self._var:
+                return self._val
+            if self._scope_cache is None:
+                self._scope_cache = {}
+            return self._get_inherited(name)
+        return super()._get(name)
+
+    def __iter__(self):
+        if self._dct is None:
+            return iter([self._var])
+        return super().__iter__()
+
+    def __contains__(self, attr):
+        if self._dct is None:
+            return attr == self._var or attr in self._base
+        return super().__contains__(attr)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or self._dct is not None:
+            return super().__getattr__(attr)
+        if attr == self._var:
+            return self._val
+        return getattr(self._base, attr)
+
+    def __setattr__(self, attr, val):
+        if not attr.startswith('_') and self._dct is None:
+            cls = type(self)
+            self._promote()
+            if type(self) is not cls:
+                # The scope started to be observed when promoted (since it is watched),
+                # the assignment must go through the observable class to notify the watchers
+                setattr(self, attr, val)
+                return
+        super().__setattr__(attr, val)
+
+    def __delattr__(self, attr):
+        if not attr.startswith('_') and self._dct is None:
+            cls = type(self)
+            self._promote()
+            if type(self) is not cls:
+                delattr(self, attr)
+                return
+        super().__delattr__(attr)
+
+    def __repr__(self):
+        if self._dct is None:
+            return repr({self._var: self._val})
+        return super().__repr__()
+
+    def __str__(self):
+        if self._dct is None:
+            return str({self._var: self._val})
+        return super().__str__()
+
+    def _snapshot(self):
+        self._promote()
+        return super()._snapshot()
+
+    def _replace(self, values):
+        self._promote()
+        super()._replace(values)
+
+    def _set(self, name, val):
+        self._promote()
+        super()._set(name, val)
+
+    def _clear(self):
+        self._promote()
+        super()._clear()
+
+    def _save(self, name):
+        self._promote()
+        super()._save(name)
+
+    def _restore(self, name):
+        self._promote()
+        super()._restore(name)
+
+    def _bind_watchers(self):
+        # The variables of a scope which is not promoted cannot change without
+        # promoting it, so the watchers need to be notified only after that
+        if self._dct is not None:
+            super()._bind_watchers()
+
+    def _unbind_watchers(self):
+        if self._dct is not None:
+            super()._unbind_watchers()
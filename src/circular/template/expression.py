@@ -13,9 +13,16 @@
 # pylint: disable=protected-access; pylint doesn't allow descendants to use parent's protected variables.
 #                                   here they are used extensively by descendants of the ExpNode class.
 
-from circular.utils.events import EventMixin
+import array
+import keyword
+import re
 
-from .observer import observe
+from circular.platform import vectorize
+from circular.utils.cache import LRUCache
+from circular.utils.events import EventMixin, Subscription
+
+from .context import Context
+from .observer import observe, ListWatcherMixin
 
 ET_EXPRESSION = 0
 ET_INTERPOLATED_STRING = 1
@@ -46,6 +53,11 @@ OP_PRIORITY = {
     '(': -2,    # Parenthesis have lowest priority so that we always stop partial evaluation when
                 #  reaching a parenthesis
     '==': 0,
+    '!=': 0,
+    '<': 0,
+    '>': 0,
+    '<=': 0,
+    '>=': 0,
     'and': 0,
     'or': 0,
     'is': 0,
@@ -65,6 +77,12 @@ OP_PRIORITY = {
     '.': 5      # Attribute access has highest priority (e.g. a.c**2 is not a.(c**2), and a.func(b) is not a.(func(b)))
 }
 
+# Types of values which can be folded into a constant by :func:`simplify`
+FOLDABLE_TYPES = (bool, int, float, str, type(None))
+
+# Types of values which can be used in vectorized comprehensions (see :meth:`ListComprNode.vectorized`)
+VECTOR_TYPES = (int, float)
+
 
 def token_type(start_chars):
     """ Identifies the next token type based on the next four characters """
@@ -200,15 +218,16 @@ def parse_identifier(expr, pos):
     return ret, pos
 
 
-def tokenize(expr):
+def tokenize_legacy(expr, start=0):
     """
-        A generator which takes a string and converts it to a
-        stream of tokens, yielding the triples (token, its value, next position in the string)
-        one by one.
+        The original character-by-character tokenizer. It produces
+        the same stream as :func:`tokenize_regex` but classifies each
+        character separately using :func:`token_type`. It is kept so that
+        the two engines can be compared (see :func:`set_tokenizer`).
     """
     # pylint: disable=too-many-branches; python doesn't have a switch statement
     # pylint: disable=too-many-statements; the length is just due to the many token types
-    pos = 0
+    pos = start
     while pos < len(expr):
         tokentype = token_type(expr[pos:pos + 4])
         if tokentype == T_SPACE:
@@ -288,6 +307,136 @@ def tokenize(expr):
             pos = pos + 1
 
 
+# Characters which may not follow a keyword or a word operator (or, is, and, ...)
+# for it to be recognized as such; otherwise it is part of an identifier
+_NOT_IDENT_CHAR = r'(?=[^A-Z\\\]^_`a-z])'
+
+_TOKEN_RE = re.compile(r"""
+      (?P<space>[ \t\n]+)
+    | (?P<punct>[\[\](){}.,:])
+    | (?P<equal>=(?!=))
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<number>[0-9]+(?:\.[0-9]*)?)
+    | (?P<operator>\*\*|//|==|!=|<=|>=|[-+*/<>%](?=.)|(?:or|and|not)""" + _NOT_IDENT_CHAR + r""")
+    | (?P<is>is""" + _NOT_IDENT_CHAR + r"""(?:[ \t\n]*not(?![0-9A-Za-z]))?)
+    | (?P<keyword>(?:in|if|for)""" + _NOT_IDENT_CHAR + r""")
+    | (?P<identifier>[A-Za-z_$][0-9A-Za-z_$]*)
+    | (?P<unknown>.)
+""", re.VERBOSE | re.DOTALL)
+
+_PUNCT_TOKENS = {
+    '[': T_LBRACKET,
+    ']': T_RBRACKET,
+    '(': T_LPAREN,
+    ')': T_RPAREN,
+    '{': T_LBRACE,
+    '}': T_RBRACE,
+    '.': T_DOT,
+    ',': T_COMMA,
+    ':': T_COLON,
+}
+
+_STRING_ESCAPES = {
+    '\\': '\\',
+    '"': '"',
+    "'": "'",
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+
+
+def _unescape(match):
+    # Unknown escape sequences are dropped, just like in :func:`parse_string`
+    return _STRING_ESCAPES.get(match.group(1), '')
+
+
+def _number_value(text):
+    """ Converts the text of a number token into its value the same way :func:`parse_number` does """
+    if '.' not in text:
+        return int(text)
+    int_part, decimal_part = text.split('.')
+    ret = int(int_part)
+    div = 10
+    for digit in decimal_part:
+        ret += int(digit) / div
+        div = div * 10
+    return ret
+
+
+def tokenize_regex(expr, start=0):
+    """
+        A tokenizer driven by a single compiled master regular expression.
+        It produces exactly the same stream as :func:`tokenize_legacy`
+        without slicing the string for each character.
+    """
+    # Since any character matches at least the 'unknown' group, the matches
+    # returned by finditer are contiguous and cover the rest of the string
+    for match in _TOKEN_RE.finditer(expr, start):
+        kind = match.lastgroup
+        val = match.group()
+        pos = match.end()
+        if kind == 'identifier':
+            yield (T_IDENTIFIER, val, pos)
+        elif kind == 'space':
+            continue
+        elif kind == 'punct':
+            yield (_PUNCT_TOKENS[val], val, pos)
+        elif kind == 'operator':
+            yield (T_OPERATOR, val, pos)
+        elif kind == 'number':
+            yield (T_NUMBER, _number_value(val), pos)
+        elif kind == 'string':
+            val = val[1:-1]
+            if '\\' in val:
+                val = _ESCAPE_RE.sub(_unescape, val)
+            yield (T_STRING, val, pos)
+        elif kind == 'keyword':
+            yield (T_KEYWORD, val, pos)
+        elif kind == 'is':
+            if val == 'is':
+                yield (T_OPERATOR, 'is', pos)
+            else:
+                yield (T_OPERATOR, 'is not', pos)
+        elif kind == 'equal':
+            yield (T_EQUAL, val, pos)
+        elif val == '"' or val == "'":
+            raise Exception("String is missing end quote: " + val)
+        else:
+            yield (T_UNKNOWN, val, pos)
+
+
+TOKENIZERS = {
+    'legacy': tokenize_legacy,
+    'regex': tokenize_regex,
+}
+
+_TOKENIZER = tokenize_regex
+
+
+def set_tokenizer(name):
+    """
+        Selects the tokenizer engine used by :func:`tokenize`. The
+        :param:`name` is one of the keys of :data:`TOKENIZERS`, i.e.
+        ``'regex'`` (the default) or ``'legacy'``.
+    """
+    global _TOKENIZER
+    _TOKENIZER = TOKENIZERS[name]
+
+
+def tokenize(expr, start=0):
+    """
+        A generator which takes a string and converts it to a
+        stream of tokens, yielding the triples (token, its value, next position in the string)
+        one by one. Tokenizing starts at position :param:`start` of the string and the
+        returned positions are positions in the whole string. The work is done by the
+        engine selected by :func:`set_tokenizer`.
+    """
+    return _TOKENIZER(expr, start)
+
+
 class ExpNode(EventMixin):
     """ Base class for nodes in the AST tree """
 
@@ -312,6 +461,9 @@ class ExpNode(EventMixin):
         # subsequent call to evaluate.
         self._dirty = True
 
+        # The function returned by :func:`compile` (created on first use)
+        self._compiled = None
+
     def eval(self, force_cache_refresh=False):
         """
             Evaluates the node looking up identifiers the context to which it was bound
@@ -336,6 +488,65 @@ class ExpNode(EventMixin):
         """
         raise NotImplementedError
 
+    def compile(self):
+        """
+            Returns a python function which takes a context and evaluates
+            the expression in this context. The function has the same
+            semantics as :func:`evalctx` but, being generated python code,
+            it avoids walking the tree. The function does not depend on
+            the context the node is bound to, so it is only generated once.
+        """
+        if self._compiled is None:
+            self._compiled = compile_ast(self)
+        return self._compiled
+
+    def evalmany(self, base_ctx, var, items, on_error=None):
+        """
+            Evaluates the node once for each element of :param:`items` with the
+            identifier :param:`var` set to the element (and all other identifiers
+            looked up in :param:`base_ctx`) and returns the list of values.
+
+            Only a single scope is created for the whole sequence and the variable
+            is rebound in place, so this is much cheaper than creating a context
+            for each element and calling :func:`evalctx`. Like :func:`evalctx`,
+            the method ignores the context the node is bound to.
+
+            If :param:`on_error` is given, an exception raised when evaluating an
+            element is passed to ``on_error(exc, item)`` and its return value is
+            used as the value for the element. Otherwise the exception propagates.
+        """
+        scope = Context(base=base_ctx)
+        dct = scope._dct
+        evaluate = ctx_evaluator(self)
+        ret = []
+        for item in items:
+            dct[var] = item
+            try:
+                ret.append(evaluate(scope))
+            # pylint: disable=broad-except; the exception is either passed to on_error or re-raised
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                ret.append(on_error(exc, item))
+        return ret
+
+    def _codegen(self, compiler):
+        """
+            Returns the source of a python expression computing the
+            value of the node (see :class:`ExpressionCompiler`).
+        """
+        raise NotImplementedError
+
+    def _vector_program(self, var, context):
+        """
+            Returns a program computing the value of the node for each value
+            of the loop variable :param:`var` (other identifiers are looked up
+            in :param:`context`) which can be run by the vectorized backend
+            (see :mod:`circular.platform.vectorize`) or ``None`` if the node
+            cannot be vectorized.
+        """
+        return None
+
     @property
     def cache_status(self):
         """
@@ -404,6 +615,27 @@ class ExpNode(EventMixin):
         """
         raise NotImplementedError
 
+    def is_shared(self):
+        """
+            Returns true if the node is shared by all clones of the tree
+            containing it (i.e. :meth:`clone` returns the node itself),
+            which is the case for constants.
+        """
+        # pylint: disable=no-member; we explicitely check that we are an IdentNode
+        return isinstance(self, ConstNode) or (isinstance(self, IdentNode) and self._const)
+
+    def bind(self, event, handler, forward_event=None, weak=False, lean=False):
+        # Shared nodes never change, so they need not keep the handlers of all the
+        # trees they are shared by (which would keep those trees alive)
+        if event == 'change' and self.is_shared():
+            return Subscription(self, event, handler, lean)
+        return super().bind(event, handler, forward_event, weak, lean)
+
+    def unbind(self, event=None, handler=None):
+        if event == 'change' and self.is_shared():
+            return
+        super().unbind(event, handler)
+
     def is_function_call(self):
         """
             Returns true if the expression is a function call.
@@ -423,12 +655,65 @@ class ExpNode(EventMixin):
         ret = ret or (isinstance(self, OpNode) and self._opstr == '[]' and isinstance(self._rarg, ListSliceNode) and not self._rarg._slice)
         return ret
 
-    def _change_handler(self, _event):
+    def is_constant(self):
+        """
+            Returns true if the expression is a constant of an immutable
+            type (a number, string, bool or None), i.e. its value does
+            not depend on any context.
+        """
+        # pylint: disable=no-member; we explicitely check that we are a ConstNode or IdentNode
+        if isinstance(self, ConstNode) or (isinstance(self, IdentNode) and self._const):
+            return type(self._cached_val) in FOLDABLE_TYPES
+        return False
+
+    def _simplify(self):
+        """
+            Folds constant subexpressions of the node into :class:`ConstNode`-s
+            and returns the simplified node which should replace it in the tree
+            (this may be the node itself, a new node or one of its descendants).
+            See :func:`simplify`.
+        """
+        return self
+
+    @staticmethod
+    def _simplified_child(child, handler):
+        """
+            Simplifies the node :param:`child` and, if it is replaced,
+            moves the change :param:`handler` to its replacement.
+        """
+        simple = child._simplify()
+        if simple is not child:
+            child.unbind('change')
+            simple.bind('change', handler, lean=True)
+        return simple
+
+    @staticmethod
+    def _observe(val, handler, subscription=None):
+        """
+            Unbinds the :param:`subscription` (if any) and binds the change :param:`handler`
+            (weakly, see :meth:`EventMixin.bind`) to the observer of :param:`val`. Returns
+            the new subscription or ``None`` if :param:`val` cannot be observed.
+        """
+        if subscription is not None:
+            subscription.unbind()
+        observer = observe(val, ignore_errors=True)
+        if observer is None:
+            return None
+        return observer.bind('change', handler, weak=True, lean=True)
+
+    def _change_handler(self, _data):
         if self._dirty and self.defined:
             return
         self._dirty = True
         self.emit('change', {})
 
+    def dump(self):
+        """
+            Returns a json-serializable representation of the tree rooted
+            at the node which can be turned back into a tree by :func:`load_ast`.
+        """
+        raise NotImplementedError
+
     def __repr__(self):
         return "<AST Node>"
 
@@ -450,10 +735,21 @@ class ConstNode(ExpNode):
     def evalctx(self, context):
         return self._cached_val
 
+    def _codegen(self, compiler):
+        return compiler.const(self._cached_val)
+
+    def _vector_program(self, var, context):
+        if type(self._cached_val) in VECTOR_TYPES:
+            return ('const', self._cached_val)
+        return None
+
     def clone(self):
         # Const Nodes can't change, so clones can be identical
         return self
 
+    def dump(self):
+        return ['c', self._cached_val]
+
     def __repr__(self):
         return repr(self._cached_val)
 
@@ -479,13 +775,15 @@ class IdentNode(ExpNode):
     def __init__(self, identifier):
         super().__init__()
         self._ident = identifier
+        # The context in which we watch the identifier for changes
+        self._watched_ctx = None
+        # The subscription to the change events of the value
+        self._value_subscription = None
         if self._ident in self.CONSTANTS:
             self._const = True
             self._cached_val = self.CONSTANTS[self._ident]
             self._defined = True
             self._dirty = False
-            self._value_observer = None
-            self._ctx_observer = None
         else:
             self._const = False
 
@@ -501,11 +799,18 @@ class IdentNode(ExpNode):
     def bind_ctx(self, context):
         super().bind_ctx(context)
         if not self._const:
-            self._ctx_observer = observe(self._ctx)
-            self._ctx_observer.bind('change', self._context_change)
-            self._value_observer = observe(self.value, ignore_errors=True)
-            if self._value_observer:
-                self._value_observer.bind('change', self._value_change)
+            if self._watched_ctx is not None:
+                self._watched_ctx._unwatch(self._ident, self._context_change)
+            self._ctx._watch(self._ident, self._context_change)
+            self._watched_ctx = self._ctx
+            self._observe_value(self.value)
+
+    def _observe_value(self, val):
+        """
+            Stops observing the previous value and starts observing :param:`val`
+            (if it can be observed) for changes.
+        """
+        self._value_subscription = self._observe(val, self._value_change, self._value_subscription)
 
     def eval(self, force_cache_refresh=False):
         if not self._const:
@@ -528,6 +833,28 @@ class IdentNode(ExpNode):
         else:
             return self._cached_val
 
+    def _codegen(self, compiler):
+        if self._const:
+            return compiler.const(self._cached_val)
+        if self._ident in compiler.local_vars:
+            return compiler.local_vars[self._ident]
+        # Non-constant identifiers are never in BUILTINS, so the KeyError
+        # raised by _get would be re-raised by evalctx anyway
+        return '_get(' + repr(self._ident) + ')'
+
+    def _vector_program(self, var, context):
+        if self._ident == var:
+            return ('var',)
+        if self._const:
+            return None
+        try:
+            val = context._get(self._ident)
+        except KeyError:
+            return None
+        if type(val) in VECTOR_TYPES:
+            return ('const', val)
+        return None
+
     def _assign(self, value):
         if self._const:
             raise Exception("Cannot assign to the constant" + self._cached_val)
@@ -538,34 +865,35 @@ class IdentNode(ExpNode):
         if self._dirty and self.defined:
             return
         if event.data['key'] == self._ident:
-            if self._value_observer:
-                self._value_observer.unbind()
             if 'value' in event.data['key']:
                 self._cached_val = event.data['value']
-                self._value_observer = observe(self._cached_val, ignore_errors=True)
-                if self._value_observer:
-                    self._value_observer.bind('change', self._value_change)
+                self._observe_value(self._cached_val)
                 self.defined = True
                 self._dirty = False
                 self.emit('change', {'value': self._cached_val})
             else:
+                self._observe_value(None)
                 self.defined = False
                 self._dirty = True
                 self.emit('change', {})
 
-    def _value_change(self, event):
+    def _value_change(self, data):
         if self._dirty and self.defined:
             return
         self._dirty = True
-        if 'value' in event.data:
+        if 'value' in data:
+            self.emit('change', {'value': self._cached_val})
+        elif 'permutation' in data or data['type'] == 'range':
+            # The list was modified in place, it is still our value
             self.emit('change', {'value': self._cached_val})
-        elif event.data['type'] in ['sort', 'reverse']:
-            self.emit('change', {})
         else:
             self.defined = False
             self._dirty = True
             self.emit('change', {})
 
+    def dump(self):
+        return ['i', self._ident]
+
     def __repr__(self):
         return self.name()
 
@@ -583,7 +911,7 @@ class MultiChildNode(ExpNode):
         for ch_index in range(len(self._children)):
             child = self._children[ch_index]
             if child is not None:
-                child.bind('change', lambda event, chi=ch_index: self._child_changed(event, chi))
+                child.bind('change', lambda data, chi=ch_index: self._child_changed(data, chi), lean=True)
 
     def clone(self):
         """
@@ -627,21 +955,50 @@ class MultiChildNode(ExpNode):
                 ret.append(None)
         return ret
 
+    def _simplify(self):
+        for ch_index in range(len(self._children)):
+            child = self._children[ch_index]
+            if child is not None:
+                self._children[ch_index] = self._simplified_child(
+                    child, lambda data, chi=ch_index: self._child_changed(data, chi))
+        return self
+
+    def _children_constant(self):
+        """
+            Returns true if all the (non-empty) children are constants.
+        """
+        for child in self._children:
+            if child is not None and not child.is_constant():
+                return False
+        return True
+
+    def _codegen_children(self, compiler):
+        """
+            Returns the list of the sources of the children
+        """
+        ret = []
+        for child in self._children:
+            if child is not None:
+                ret.append(child._codegen(compiler))
+            else:
+                ret.append('None')
+        return ret
+
     def bind_ctx(self, context):
         for child in self._children:
             if child is not None:
                 child.bind_ctx(context)
 
-    def _child_changed(self, event, child_index):
+    def _child_changed(self, data, child_index):
         if self._dirty_children and self.defined:
             return
-        if 'value' in event.data:
-            self._cached_vals[child_index] = event.data['value']
+        if 'value' in data:
+            self._cached_vals[child_index] = data['value']
         else:
             self._dirty_children = True
         if not self._dirty or not self.defined:
             self._dirty = True
-            self.emit('change')
+            self.emit('change', {})
 
 
 class ListNode(MultiChildNode):
@@ -658,6 +1015,12 @@ class ListNode(MultiChildNode):
     def clone(self):
         return ListNode(super().clone())
 
+    def _codegen(self, compiler):
+        return '[' + ', '.join(self._codegen_children(compiler)) + ']'
+
+    def dump(self):
+        return ['l', [_dump_optional(child) for child in self._children]]
+
     def __repr__(self):
         return repr(self._children)
 
@@ -671,7 +1034,7 @@ class FuncArgsNode(MultiChildNode):
         self._cached_kwargs = {}
         self._dirty_kwargs = False
         for (kwarg, val) in self._kwargs.items():
-            val.bind('change', lambda event, arg=kwarg: self._kwarg_change(event, arg))
+            val.bind('change', lambda data, arg=kwarg: self._kwarg_change(data, arg), lean=True)
 
     def clone(self):
         cloned_args = super().clone()
@@ -700,21 +1063,49 @@ class FuncArgsNode(MultiChildNode):
             kwargs[arg] = val.evalctx(context)
         return args, kwargs
 
+    def _simplify(self):
+        super()._simplify()
+        for (kwarg, val) in self._kwargs.items():
+            self._kwargs[kwarg] = self._simplified_child(val, lambda data, arg=kwarg: self._kwarg_change(data, arg))
+        return self
+
+    def _codegen_kwargs(self, compiler):
+        return '{' + ', '.join([repr(arg) + ': ' + val._codegen(compiler) for (arg, val) in self._kwargs.items()]) + '}'
+
+    def _codegen(self, compiler):
+        return '([' + ', '.join(self._codegen_children(compiler)) + '], ' + self._codegen_kwargs(compiler) + ')'
+
+    def _codegen_call(self, compiler):
+        """
+            Returns the source of the argument list of a function call
+            (without the enclosing parenthesis).
+        """
+        args = self._codegen_children(compiler)
+        if self._kwargs:
+            args.append('**' + self._codegen_kwargs(compiler))
+        return ', '.join(args)
+
     def bind_ctx(self, context):
         super().bind_ctx(context)
         for kwarg in self._kwargs.values():
             kwarg.bind_ctx(context)
 
-    def _kwarg_change(self, event, arg):
+    def _kwarg_change(self, data, arg):
         if self._dirty_kwargs and self.defined:
             return
-        if 'value' in event.data:
-            self._cached_kwargs[arg] = event.data['value']
+        if 'value' in data:
+            self._cached_kwargs[arg] = data['value']
         else:
             self._dirty_kwargs = True
         if not self._dirty or not self.defined:
             self._dirty = True
-            self.emit('change')
+            self.emit('change', {})
+
+    def dump(self):
+        kwargs = {}
+        for (arg, val) in self._kwargs.items():
+            kwargs[arg] = val.dump()
+        return ['f', [_dump_optional(child) for child in self._children], kwargs]
 
     def __repr__(self):
         return ','.join([repr(child) for child in self._children] +
@@ -754,6 +1145,21 @@ class ListSliceNode(MultiChildNode):
         else:
             return start
 
+    def _codegen(self, compiler):
+        """
+            Since a ListSliceNode only appears as the right argument of
+            the ``[]`` operator, this returns the source of the subscript
+            (e.g. ``a:b:c``) and not of a standalone expression.
+        """
+        start, end, step = self._codegen_children(compiler)
+        if self._slice:
+            return start + ':' + end + ':' + step
+        else:
+            return start
+
+    def dump(self):
+        return ['s', self._slice] + [_dump_optional(child) for child in self._children]
+
     def __repr__(self):
         start, end, step = self._children
         if self._slice:
@@ -778,8 +1184,9 @@ class AttrAccessNode(ExpNode):
         super().__init__()
         self._obj = obj
         self._attr = attribute
-        self._observer = None
-        self._obj.bind('change', self._change_handler)
+        # The subscription to the change events of the value
+        self._subscription = None
+        self._obj.bind('change', self._change_handler, lean=True)
 
     def clone(self):
         return AttrAccessNode(self._obj.clone(), self._attr.clone())
@@ -791,11 +1198,9 @@ class AttrAccessNode(ExpNode):
         """
         if self._dirty or force_cache_refresh:
             self.defined = False
-            if self._observer:
-                self._observer.unbind()
             obj_val = self._obj.eval(force_cache_refresh=force_cache_refresh)
             self._cached_val = getattr(obj_val, self._attr.name())
-            self._observer = observe(self._cached_val, self._change_attr_handler, ignore_errors=True)
+            self._subscription = self._observe(self._cached_val, self._change_attr_handler, self._subscription)
             self._dirty = False
             self.defined = True
         return self._cached_val
@@ -809,39 +1214,57 @@ class AttrAccessNode(ExpNode):
         obj_val = self._obj.evalctx(context)
         return getattr(obj_val, self._attr.name())
 
+    def _simplify(self):
+        self._obj = self._simplified_child(self._obj, self._change_handler)
+        return self
+
+    def _codegen(self, compiler):
+        attr = self._attr.name()
+        if attr.isidentifier() and not keyword.iskeyword(attr):
+            return '(' + self._obj._codegen(compiler) + ').' + attr
+        return 'getattr(' + self._obj._codegen(compiler) + ', ' + repr(attr) + ')'
+
     def _assign(self, value):
         obj_val = self._obj.eval()
         setattr(obj_val, self._attr.name(), value)
-        if self._observer:
-            self._observer.unbind()
         self._cached_val = value
-        self._observer = observe(self._cached_val, self._change_attr_handler, ignore_errors=True)
+        self._subscription = self._observe(self._cached_val, self._change_attr_handler, self._subscription)
         self.defined = True
 
     def bind_ctx(self, context):
-        if self._observer is not None:
-            self._observer.unbind()
+        if self._subscription is not None:
+            self._subscription.unbind()
+            self._subscription = None
         self._obj.bind_ctx(context)
 
-    def _change_attr_handler(self, event):
+    def _change_attr_handler(self, data):
         """
             Handles changes to the value of the attribute.
         """
         if self._dirty and self.defined:
             return
-        if 'value' in event.data:
+        if 'value' in data:
             self._dirty = True
             self.emit('change', {'value': self._cached_val})
         else:
             self._dirty = True
             self.emit('change', {})
 
+    def dump(self):
+        return ['a', self._obj.dump(), self._attr.dump()]
+
     def __repr__(self):
         return repr(self._obj) + '.' + repr(self._attr)
 
 
-class ListComprNode(ExpNode):
-    """ Node representing comprehension, e.g. [ x+10 for x in lst if x//2 == 0 ] """
+class ListComprNode(ListWatcherMixin, ExpNode):
+    """ Node representing comprehension, e.g. [ x+10 for x in lst if x//2 == 0 ]
+
+        When the node is bound to a context and the list is modified in place
+        (e.g. by ``append``, ``insert``, ``remove``, ``pop`` or ``__setitem__``),
+        the value is updated by evaluating the expression only for the affected
+        elements instead of recomputing the whole comprehension.
+    """
 
     def __init__(self, expr, var, lst, cond):
         super().__init__()
@@ -849,10 +1272,19 @@ class ListComprNode(ExpNode):
         self._var = var
         self._lst = lst
         self._cond = cond
-        self._expr.bind('change', self._change_handler)
-        self._lst.bind('change', self._change_handler)
+        # The state used for updating the value incrementally: the list for
+        # which the value was computed (or None if it needs to be recomputed),
+        # the change events it emitted since, for each of its elements whether
+        # it satisfies the condition and the values for the satisfying elements
+        self._src = None
+        self._src_subscription = None
+        self._src_events = []
+        self._kept = []
+        self._values = []
+        self._expr.bind('change', self._dep_change_handler, lean=True)
+        self._lst.bind('change', self._change_handler, lean=True)
         if self._cond is not None:
-            self._cond.bind('change', self._change_handler)
+            self._cond.bind('change', self._dep_change_handler, lean=True)
 
     def clone(self):
         expr_c = self._expr.clone()
@@ -868,36 +1300,218 @@ class ListComprNode(ExpNode):
         if self._dirty or force_cache_refresh:
             self.defined = False
             lst = self._lst.eval(force_cache_refresh=force_cache_refresh)
-            self._cached_val = []
-            var_name = self._var.name()
-            self._ctx._save(var_name)
-            for elem in lst:
-                self._ctx._set(var_name, elem)
-                if self._cond is None or self._cond.eval(force_cache_refresh=True):
-                    self._cached_val.append(self._expr.eval(force_cache_refresh=True))
-            self._ctx._restore(var_name)
+            if lst is self._src and not force_cache_refresh and self._watching() and self._patch():
+                self._cached_val = list(self._values)
+            else:
+                self._recompute(lst)
             self.defined = True
             self._dirty = False
         return self._cached_val
 
-    def evalctx(self, context):
-        lst = self._lst.evalctx(context)
+    def _recompute(self, lst):
+        """
+            Computes the value of the comprehension over :param:`lst` from scratch
+            and, if possible, starts watching :param:`lst` for changes so that
+            the value can be updated incrementally.
+        """
+        self._unwatch_src()
+        self._values, self._kept = self._eval_all(lst)
+        self._cached_val = list(self._values)
+        self._watch_src(lst)
+
+    def _eval_all(self, items):
+        """
+            Returns the values for the elements of :param:`items` satisfying the
+            condition together with the list of booleans indicating which elements
+            satisfy it. (Uses the vectorized backend, if possible)
+        """
+        vectorized = self.vectorized(self._ctx, items, with_mask=True)
+        if vectorized is not None:
+            return vectorized
+        results = self._eval_items(items)
+        return [val for (keep, val) in results if keep], [keep for (keep, _val) in results]
+
+    def _eval_items(self, items):
+        """
+            Evaluates the condition and the expression for each element of
+            :param:`items` and returns a list of pairs (whether the element
+            satisfies the condition, the value of the expression or ``None``).
+        """
         ret = []
         var_name = self._var.name()
-        context._save(var_name)
-        for elem in lst:
-            context._set(var_name, elem)
-            if self._cond is None or self._cond.evalctx(context):
-                ret.append(self._expr.evalctx(context))
-        context._restore(var_name)
+        self._ctx._save(var_name)
+        try:
+            for elem in items:
+                self._ctx._set(var_name, elem)
+                if self._cond is None or self._cond.eval(force_cache_refresh=True):
+                    ret.append((True, self._expr.eval(force_cache_refresh=True)))
+                else:
+                    ret.append((False, None))
+        finally:
+            self._ctx._restore(var_name)
         return ret
 
+    def _patch(self):
+        """
+            Updates the value by replaying the change events emitted by the
+            list since the last evaluation. Returns ``False`` if the events
+            cannot be replayed and the value needs to be recomputed.
+        """
+        events, self._src_events = self._src_events, []
+        patched = False
+        try:
+            patched = all(self._replay(event) for event in events)
+        finally:
+            if not patched:
+                self._unwatch_src()
+        return patched
+
+    def _replay(self, event):
+        # pylint: disable=too-many-return-statements; one return per event type
+        kept = self._kept
+        ev_type = event['type']
+        if ev_type in ['append', 'extend']:
+            items = [event['value']] if ev_type == 'append' else event['value']
+            for (keep, val) in self._eval_items(items):
+                kept.append(keep)
+                if keep:
+                    self._values.append(val)
+            return True
+        elif ev_type == 'insert':
+            # The event index is the index of the element preceding the inserted one
+            index = event['index'] + 1
+            if index < 0:
+                index = max(index + len(kept), 0)
+            self._insert(min(index, len(kept)), event['value'])
+            return True
+        elif ev_type == 'clear':
+            del kept[:]
+            del self._values[:]
+            return True
+        elif ev_type in ['sort', 'reverse'] and 'permutation' in event:
+            # The permutation maps new positions to old positions in the list
+            perm = event['permutation']
+            if len(perm) != len(kept):
+                return False
+            values = iter(self._values)
+            by_item = [next(values) if keep else None for keep in kept]
+            self._kept = [kept[i] for i in perm]
+            self._values = [by_item[i] for i in perm if kept[i]]
+            return True
+        elif ev_type == 'batch':
+            return all(self._replay(change) for change in event['events'])
+        elif ev_type == 'range':
+            start, stop = event['start'], event['stop']
+            values, keep = self._eval_all(event['values'])
+            out_start = self._out_index(start)
+            self._values[out_start:out_start + kept[start:stop].count(True)] = values
+            kept[start:stop] = keep
+            return True
+        elif ev_type in ['remove', '__delitem__', '__setitem__']:
+            index = event.get('index', event.get('key'))
+            if not isinstance(index, int):
+                return False
+            if index < 0:
+                index += len(kept)
+            self._delete(index)
+            if ev_type == '__setitem__':
+                self._insert(index, event['value'])
+            return True
+        return False
+
+    def _out_index(self, index):
+        """ Returns the position in the value of the element at :param:`index` in the list. """
+        if self._cond is None:
+            return index
+        return self._kept[:index].count(True)
+
+    def _insert(self, index, item):
+        ((keep, val),) = self._eval_items([item])
+        if keep:
+            self._values.insert(self._out_index(index), val)
+        self._kept.insert(index, keep)
+
+    def _delete(self, index):
+        if self._kept[index]:
+            del self._values[self._out_index(index)]
+        del self._kept[index]
+
+    def _src_change(self, data):
+        if super()._src_change(data):
+            self._change_handler(data)
+
+    def _dep_change_handler(self, data):
+        # The expression or the condition changed, so the whole comprehension must be recomputed
+        self._unwatch_src()
+        self._change_handler(data)
+
+    def vectorized(self, context, lst, with_mask=False):
+        """
+            Tries to compute the comprehension over :param:`lst` using the
+            vectorized backend (see :mod:`circular.platform.vectorize`). This
+            is only done for long enough lists (see :func:`set_vectorize_min_size`)
+            and if the expression and the condition consist of arithmetic and
+            comparisons on the loop variable and numeric constants or identifiers.
+            Returns ``None`` if the comprehension could not be vectorized. If
+            :param:`with_mask` is ``True``, the value is returned together with
+            the list of booleans indicating which elements satisfy the condition.
+        """
+        if _VECTORIZE_MIN_SIZE is None or not vectorize.AVAILABLE:
+            return None
+        if not isinstance(lst, (list, array.array)) or len(lst) < _VECTORIZE_MIN_SIZE:
+            return None
+        var_name = self._var.name()
+        expr = self._expr._vector_program(var_name, context)
+        if expr is None:
+            return None
+        if self._cond is None:
+            cond = None
+        else:
+            cond = self._cond._vector_program(var_name, context)
+            if cond is None:
+                return None
+        return vectorize.eval_comprehension(expr, cond, lst, with_mask=with_mask)
+
+    def evalctx(self, context):
+        lst = self._lst.evalctx(context)
+        ret = self.vectorized(context, lst)
+        if ret is not None:
+            return ret
+        var_name = self._var.name()
+        if self._cond is not None:
+            # The list is iterated twice, so it must not be a one-shot iterable
+            lst = list(lst)
+            lst = [elem for (elem, keep) in zip(lst, self._cond.evalmany(context, var_name, lst)) if keep]
+        return self._expr.evalmany(context, var_name, lst)
+
+    def _simplify(self):
+        self._expr = self._simplified_child(self._expr, self._dep_change_handler)
+        self._lst = self._simplified_child(self._lst, self._change_handler)
+        if self._cond is not None:
+            self._cond = self._simplified_child(self._cond, self._dep_change_handler)
+        return self
+
+    def _codegen(self, compiler):
+        lst = self._lst._codegen(compiler)
+        var_name = self._var.name()
+        local_var = compiler.push_local(var_name)
+        ret = '[' + self._expr._codegen(compiler) + ' for ' + local_var + ' in ' + lst
+        if self._cond is not None:
+            ret += ' if ' + self._cond._codegen(compiler)
+        compiler.pop_local(var_name)
+        return ret + ']'
+
     def bind_ctx(self, context):
         super().bind_ctx(context)
+        self._unwatch_src()
         self._lst.bind_ctx(context)
-        self._cond.bind_ctx(context)
+        if self._cond is not None:
+            self._cond.bind_ctx(context)
         self._expr.bind_ctx(context)
 
+    def dump(self):
+        return ['L', self._expr.dump(), self._var.dump(), self._lst.dump(), _dump_optional(self._cond)]
+
     def __repr__(self):
         if self._cond is None:
             return '[' + repr(self._expr) + ' for ' + \
@@ -908,8 +1522,17 @@ class ListComprNode(ExpNode):
 
 
 class OpNode(ExpNode):
-    """ Node representing an operation, e.g. a is None, a**5, a[10], a.b or func(x,y)"""
+    """ Node representing an operation, e.g. a is None, a**5, a[10], a.b or func(x,y)
+
+        The boolean operators ``and`` and ``or`` short-circuit: when the left
+        argument decides the result, the right argument is neither evaluated
+        nor subscribed to (its change events are ignored until it is needed
+        again). The right argument is only bound to the context when it is
+        first needed.
+    """
     UNARY = ['-unary', 'not']
+    SHORT_CIRCUIT = ['and', 'or']
+    VECTOR_OPS = ['+', '-', '*', '/', '//', '%', '**', '==', '!=', '<', '>', '<=', '>=']
     OPS = {
         '+': lambda x, y: x + y,
         '-': lambda x, y: x - y,
@@ -941,10 +1564,16 @@ class OpNode(ExpNode):
         self._op = OpNode.OPS[operator]
         self._larg = l_exp
         self._rarg = r_exp
-        self._observer = None
+        # The subscription to the change events of the value (for '[]' and '()')
+        self._subscription = None
+        # Whether the right argument is bound to our context (it is
+        # bound lazily for short circuiting operators) and whether we
+        # are subscribed to its change events
+        self._rarg_bound = False
+        self._rarg_subscribed = True
         if l_exp is not None:  # The unary operator 'not' does not have a left argument
-            l_exp.bind('change', self._change_handler)
-        r_exp.bind('change', self._change_handler)
+            l_exp.bind('change', self._change_handler, lean=True)
+        r_exp.bind('change', self._change_handler, lean=True)
 
     def clone(self):
         if self._larg is None:
@@ -960,16 +1589,20 @@ class OpNode(ExpNode):
             if self._opstr in self.UNARY:
                 self._cached_val = self._op(self._rarg.eval(
                     force_cache_refresh=force_cache_refresh))
+            elif self._opstr in self.SHORT_CIRCUIT:
+                left = self._larg.eval(force_cache_refresh=force_cache_refresh)
+                if bool(left) == (self._opstr == 'or'):
+                    self._unsubscribe_rarg()
+                    self._cached_val = left
+                else:
+                    self._subscribe_rarg()
+                    self._cached_val = self._rarg.eval(force_cache_refresh=force_cache_refresh)
             else:
                 left = self._larg.eval(force_cache_refresh=force_cache_refresh)
                 right = self._rarg.eval(force_cache_refresh=force_cache_refresh)
                 self._cached_val = self._op(left, right)
             if self._opstr in ['[]', '()']:
-                if self._observer is not None:
-                    self._observer.unbind()
-                self._observer = observe(self._cached_val, ignore_errors=True)
-                if self._observer is not None:
-                    self._observer.bind('change', self._change_handler)
+                self._subscription = self._observe(self._cached_val, self._change_handler, self._subscription)
             self.defined = True
             self._dirty = False
         return self._cached_val
@@ -977,11 +1610,71 @@ class OpNode(ExpNode):
     def evalctx(self, context):
         if self._opstr in self.UNARY:
             return self._op(self._rarg.evalctx(context))
+        elif self._opstr in self.SHORT_CIRCUIT:
+            left = self._larg.evalctx(context)
+            if bool(left) == (self._opstr == 'or'):
+                return left
+            return self._rarg.evalctx(context)
         else:
             return self._op(
                 self._larg.evalctx(context),
                 self._rarg.evalctx(context))
 
+    def _simplify(self):
+        if self._larg is not None:
+            self._larg = self._simplified_child(self._larg, self._change_handler)
+        self._rarg = self._simplified_child(self._rarg, self._change_handler)
+        if self._opstr == '()':
+            # Function calls are never folded
+            return self
+        if self._opstr == '[]':
+            constant = self._larg.is_constant() and self._rarg._children_constant()
+        else:
+            constant = (self._larg is None or self._larg.is_constant()) and self._rarg.is_constant()
+        if constant:
+            try:
+                val = self.evalctx(None)
+                if type(val) in FOLDABLE_TYPES:
+                    return ConstNode(val)
+            # pylint: disable=broad-except; if the evaluation fails, the expression is kept so that it fails at runtime
+            except Exception:
+                pass
+        elif self._opstr in ['and', 'or'] and self._larg.is_constant():
+            # `C and x` is `x` if C is true, otherwise it is `C`; similarly for `or`
+            left_val = self._larg.evalctx(None)
+            if bool(left_val) == (self._opstr == 'and'):
+                self._unsubscribe_rarg()
+                return self._rarg
+            return ConstNode(left_val)
+        return self
+
+    def _codegen(self, compiler):
+        right = self._rarg
+        if self._opstr == '-unary':
+            return '(-' + right._codegen(compiler) + ')'
+        elif self._opstr == 'not':
+            return '(not ' + right._codegen(compiler) + ')'
+        left = self._larg._codegen(compiler)
+        if self._opstr == '[]':
+            return '(' + left + ')[' + right._codegen(compiler) + ']'
+        elif self._opstr == '()':
+            return '(' + left + ')(' + right._codegen_call(compiler) + ')'
+        else:
+            return '(' + left + ' ' + self._opstr + ' ' + right._codegen(compiler) + ')'
+
+    def _vector_program(self, var, context):
+        if self._opstr != '-unary' and self._opstr not in self.VECTOR_OPS:
+            return None
+        right = self._rarg._vector_program(var, context)
+        if right is None:
+            return None
+        if self._opstr == '-unary':
+            return ('neg', right)
+        left = self._larg._vector_program(var, context)
+        if left is None:
+            return None
+        return ('op', self._opstr, left, right)
+
     def call(self, *inject_args, **inject_kwargs):
         """
             Assuming the node is a function call, call the function
@@ -1006,9 +1699,43 @@ class OpNode(ExpNode):
         self.defined = True
 
     def bind_ctx(self, context):
+        super().bind_ctx(context)
         if self._opstr not in self.UNARY:
             self._larg.bind_ctx(context)
-        self._rarg.bind_ctx(context)
+        if self._opstr in self.SHORT_CIRCUIT:
+            if self._rarg_bound and self._rarg_subscribed:
+                # The right argument is in use, so it must not stay bound to the old context
+                self._rarg.bind_ctx(context)
+            else:
+                self._rarg_bound = False
+        else:
+            self._rarg.bind_ctx(context)
+            self._rarg_bound = True
+
+    def _subscribe_rarg(self):
+        """
+            Makes sure the right argument is bound to the context and that
+            its changes are propagated (used by short-circuiting operators when
+            the value of the right argument is needed).
+        """
+        if not self._rarg_bound and self._ctx is not None:
+            self._rarg.bind_ctx(self._ctx)
+            self._rarg_bound = True
+        if not self._rarg_subscribed:
+            self._rarg.bind('change', self._change_handler, lean=True)
+            self._rarg_subscribed = True
+
+    def _unsubscribe_rarg(self):
+        """
+            Stops propagating changes of the right argument (used by short-circuiting
+            operators when the result does not depend on the right argument).
+        """
+        if self._rarg_subscribed:
+            self._rarg.unbind('change', self._change_handler)
+            self._rarg_subscribed = False
+
+    def dump(self):
+        return ['o', self._opstr, _dump_optional(self._larg), self._rarg.dump()]
 
     def __repr__(self):
         if self._opstr == '-unary':
@@ -1035,6 +1762,53 @@ class OpNode(ExpNode):
             return l_repr + ' ' + self._opstr + ' ' + r_repr
 
 
+def _dump_optional(node):
+    if node is None:
+        return None
+    return node.dump()
+
+
+def load_ast(data):
+    """
+        Creates the AST tree from its serialized representation
+        :param:`data` (as returned by :func:`ExpNode.dump`).
+    """
+    if data is None:
+        return None
+    kind = data[0]
+    if kind == 'c':
+        return ConstNode(data[1])
+    elif kind == 'i':
+        return IdentNode(data[1])
+    elif kind == 'o':
+        return OpNode(data[1], load_ast(data[2]), load_ast(data[3]))
+    elif kind == 'a':
+        return AttrAccessNode(load_ast(data[1]), load_ast(data[2]))
+    elif kind == 'l':
+        return ListNode([load_ast(child) for child in data[1]])
+    elif kind == 'f':
+        kwargs = {}
+        for (arg, val) in data[2].items():
+            kwargs[arg] = load_ast(val)
+        return FuncArgsNode([load_ast(child) for child in data[1]], kwargs)
+    elif kind == 's':
+        return ListSliceNode(data[1], load_ast(data[2]), load_ast(data[3]), load_ast(data[4]))
+    elif kind == 'L':
+        return ListComprNode(load_ast(data[1]), load_ast(data[2]), load_ast(data[3]), load_ast(data[4]))
+    raise Exception("Invalid serialized expression: " + repr(data))
+
+
+def simplify(ast):
+    """
+        Optimizes the freshly parsed tree :param:`ast` by folding constant
+        subtrees (e.g. ``2*3+x`` becomes ``6+x``) and simplifying ``and``/``or``
+        expressions whose left argument is constant. This reduces the number of
+        nodes which need to be bound to a context and evaluated. Function calls
+        are never folded. Returns the root of the simplified tree.
+    """
+    return ast._simplify()
+
+
 def partial_eval(arg_stack, op_stack, pri=-1):
     """ Partially evaluates the stack, i.e. while the operators in @op_stack have strictly
         higher priority then @pri, they are converted to OpNodes/AttrAccessNodes with
@@ -1132,31 +1906,264 @@ def parse_interpolated_str(tpl_expr):
         ```
           ["Test text ",str(exp)," other text ",str(exp2)," final text."]
         ```
+
+        The expressions are simplified (see :func:`simplify`) and constant
+        expressions are merged, together with the surrounding text, into a
+        single string constant.
+    """
+    ret = []
+    for part in interpolated_str_parts(tpl_expr):
+        if isinstance(part, str):
+            ret.append(ConstNode(part))
+        else:
+            ret.append(OpNode("()", IdentNode("str"), FuncArgsNode([part], {})))  # Wrap the expression in a str call
+    return ret
+
+
+def interpolated_str_parts(tpl_expr):
+    """
+        Parses the interpolated string :param:`tpl_expr` (see :func:`parse_interpolated_str`)
+        and returns the list of its parts: the literal text (including the constant
+        expressions) as strings and the asts of the other expressions (not wrapped
+        in ``str`` calls), e.g.:
+
+        ```
+          ["Test text ", exp, " other text ", exp2, " final text."]
+        ```
     """
+    bundled = _BUNDLE.get((ET_INTERPOLATED_STRING, tpl_expr), None)
+    if bundled is not None:
+        return [part if isinstance(part, str) else load_ast(part) for part in bundled]
+    # The string is processed in a single pass: the literal text between
+    # the expressions is collected in ``literal`` (so that adjacent constant
+    # parts are joined only once) and the expressions are tokenized in place,
+    # starting at the position following the '{{'.
+    ret = []
+    literal = []
     last_pos = 0
     abs_pos = tpl_expr.find("{{", 0)
-    token_stream = tokenize(tpl_expr[abs_pos + 2:])
-    ret = []
     while abs_pos > -1:
-        ret.append(ConstNode(tpl_expr[last_pos:abs_pos]))                    # Get string from last }} to current {{
+        literal.append(tpl_expr[last_pos:abs_pos])                           # Get string from last }} to current {{
         abs_pos += 2                                                         # Skip '{{'
-        token_stream = tokenize(tpl_expr[abs_pos:])                          # Tokenize string from {{ to the ending }}
-        ast, _etok, rel_pos = _parse(token_stream, end_tokens=[T_RBRACE])
-        abs_pos += rel_pos                                                   # Move to the second ending brace of the expression
+        token_stream = tokenize(tpl_expr, abs_pos)                           # Tokenize string from {{ to the ending }}
+        ast, _etok, abs_pos = _parse(token_stream, end_tokens=[T_RBRACE])    # Move to the second ending brace of the expression
         if not tpl_expr[abs_pos] == "}":
             raise Exception("Invalid interpolated string, expecting '}' at " +
                             str(abs_pos) + " got '" + str(tpl_expr[abs_pos]) + "' instead.")
         else:
             abs_pos += 1                                                     # Skip the ending '}'
-        ret.append(OpNode("()", IdentNode("str"), FuncArgsNode([ast], {})))  # Wrap the expression in a str call and add it to the list
+        if ast is None:                                                      # An empty expression ('{{ }}') evaluates to None
+            ast = ConstNode(None)
+        ast = simplify(ast)
+        if ast.is_constant():                                                # Merge constant expressions into the text
+            literal.append(str(ast.evalctx(None)))
+        else:
+            _flush_literal(ret, literal)
+            ret.append(ast)
         last_pos = abs_pos
         abs_pos = tpl_expr.find("{{", last_pos)
-    if len(tpl_expr) > last_pos:
-        ret.append(ConstNode(tpl_expr[last_pos:]))
+    literal.append(tpl_expr[last_pos:])
+    _flush_literal(ret, literal)
     return ret
 
 
-_PARSE_CACHE = {}
+def _flush_literal(parts, literal):
+    """
+        Appends the text collected in the list :param:`literal` as a single
+        string to :param:`parts` (unless it is empty) and clears :param:`literal`.
+    """
+    text = "".join(literal)
+    if text:
+        parts.append(text)
+    del literal[:]
+
+
+class ExpressionCompiler(object):
+    """
+        Holds the state needed while generating the source of a compiled
+        expression (see :func:`compile_ast`): the namespace containing
+        non-literal constants and the python names of the loop variables
+        of the comprehensions being generated.
+    """
+    LITERAL_TYPES = (bool, int, float, str, type(None))
+
+    def __init__(self):
+        self.namespace = {}
+        self.local_vars = {}
+        self._saved_vars = []
+
+    def const(self, val):
+        """
+            Returns the source of an expression evaluating to the constant :param:`val`.
+        """
+        if type(val) in self.LITERAL_TYPES:
+            return repr(val)
+        name = '_const_' + str(len(self.namespace))
+        self.namespace[name] = val
+        return name
+
+    def push_local(self, var_name):
+        """
+            Makes the identifier :param:`var_name` refer to a (new) local variable
+            instead of being looked up in the context. Returns the name of the
+            local variable.
+        """
+        self._saved_vars.append(self.local_vars.get(var_name, None))
+        local_var = '_var_' + str(len(self._saved_vars))
+        self.local_vars[var_name] = local_var
+        return local_var
+
+    def pop_local(self, var_name):
+        """
+            Undoes the last call to :func:`push_local`.
+        """
+        saved = self._saved_vars.pop()
+        if saved is None:
+            del self.local_vars[var_name]
+        else:
+            self.local_vars[var_name] = saved
+
+
+def compile_ast(ast):
+    """
+        Generates a python function which takes a :class:`Context` and
+        evaluates the expression represented by :param:`ast` in this context.
+        The function is equivalent to ``ast.evalctx`` but it evaluates the
+        whole expression in a single python call instead of recursively
+        walking the tree.
+    """
+    compiler = ExpressionCompiler()
+    src = "def _compiled(ctx):\n" + \
+          "    _get = ctx._get\n" + \
+          "    return " + ast._codegen(compiler) + "\n"
+    exec(src, compiler.namespace)
+    return compiler.namespace['_compiled']
+
+
+EVAL_INTERPRETED = 'interpreted'
+EVAL_COMPILED = 'compiled'
+
+_EVAL_MODE = EVAL_INTERPRETED
+
+
+def set_evaluation_mode(mode):
+    """
+        Sets the evaluation mode used by :func:`ctx_evaluator`. The
+        :param:`mode` is either :data:`EVAL_INTERPRETED` (the default)
+        or :data:`EVAL_COMPILED`.
+    """
+    global _EVAL_MODE
+    if mode not in [EVAL_INTERPRETED, EVAL_COMPILED]:
+        raise Exception("Unknown evaluation mode: " + str(mode))
+    _EVAL_MODE = mode
+
+
+# Comprehensions over lists shorter than this are not vectorized
+_VECTORIZE_MIN_SIZE = 1000
+
+
+def set_vectorize_min_size(size):
+    """
+        Sets the minimal length of a list for which comprehensions over it are
+        vectorized (see :meth:`ListComprNode.vectorized`). If :param:`size`
+        is ``None``, comprehensions are never vectorized.
+    """
+    global _VECTORIZE_MIN_SIZE
+    _VECTORIZE_MIN_SIZE = size
+
+
+def ctx_evaluator(ast):
+    """
+        Returns a function which takes a context and evaluates :param:`ast`
+        in this context. Depending on the evaluation mode (see
+        :func:`set_evaluation_mode`) this is either ``ast.evalctx`` or
+        the compiled function ``ast.compile()``.
+    """
+    if _EVAL_MODE == EVAL_COMPILED:
+        return ast.compile()
+    return ast.evalctx
+
+
+BUNDLE_VERSION = 2
+
+_BUNDLE = {}
+
+
+def build_bundle(expressions=(), interpolated_strs=()):
+    """
+        Parses the expressions and interpolated strings and returns a
+        json-serializable bundle containing their ASTs which can be
+        loaded at runtime using :func:`load_bundle`. The elements of
+        :param:`expressions` are either strings or pairs
+        ``(expr, trailing_garbage_ok)`` corresponding to the arguments
+        passed to :func:`parse`.
+    """
+    entries = []
+    for expr in expressions:
+        if isinstance(expr, str):
+            expr, trailing_garbage_ok = expr, False
+        else:
+            expr, trailing_garbage_ok = expr
+        ast, pos = parse(expr, trailing_garbage_ok=trailing_garbage_ok, use_cache=False)
+        entries.append([ET_EXPRESSION, expr, trailing_garbage_ok, pos, ast.dump()])
+    for tpl_expr in interpolated_strs:
+        parts = interpolated_str_parts(tpl_expr)
+        entries.append([ET_INTERPOLATED_STRING, tpl_expr, [part if isinstance(part, str) else part.dump() for part in parts]])
+    return {'version': BUNDLE_VERSION, 'entries': entries}
+
+
+def load_bundle(bundle):
+    """
+        Loads a bundle of precompiled expressions created by
+        :func:`build_bundle` (e.g. by the ``web.precompile`` fabric
+        task). Afterwards :func:`parse` and :func:`interpolated_str_parts`
+        (used by :func:`parse_interpolated_str`) take the ASTs of the bundled
+        expressions from the bundle instead of tokenizing and parsing them.
+        In the browser one would typically do
+
+        ```
+            import json
+            from circular.template.expression import load_bundle
+
+            load_bundle(json.loads(open('expressions.json').read()))
+        ```
+
+        before creating the templates. Bundles created by a different
+        version of the library are ignored.
+    """
+    if bundle.get('version', None) != BUNDLE_VERSION:
+        return
+    for entry in bundle['entries']:
+        if entry[0] == ET_EXPRESSION:
+            _BUNDLE[(ET_EXPRESSION, entry[1], entry[2])] = (entry[3], entry[4])
+        else:
+            _BUNDLE[(ET_INTERPOLATED_STRING, entry[1])] = entry[2]
+
+
+def clear_bundle():
+    """
+        Forgets all expressions loaded by :func:`load_bundle`.
+    """
+    _BUNDLE.clear()
+
+
+_PARSE_CACHE = LRUCache(maxsize=1024)
+
+
+def set_parse_cache_size(maxsize):
+    """
+        Sets the maximal number of parsed expressions kept in the parse
+        cache (``None`` means unbounded, ``0`` disables the cache).
+    """
+    _PARSE_CACHE.resize(maxsize)
+
+
+def parse_cache_stats():
+    """
+        Returns the hit, miss and eviction counters and the size
+        of the parse cache (see :func:`LRUCache.stats`).
+    """
+    return _PARSE_CACHE.stats()
 
 
 def parse(expr, trailing_garbage_ok=False, use_cache=True):
@@ -1170,18 +2177,34 @@ def parse(expr, trailing_garbage_ok=False, use_cache=True):
         of the AST tree and the position in the string ``expr`` where
         parsing stopped.
 
-        Additionnaly, the method maintains a cache of parsed expressions
-        and, unless the parameter :parameter:`use_cache` is set to
-        ``False``, the parsed trees are first looked up in this cache
-        and, if present, a clone is returned.
+        Additionnaly, the method maintains a bounded (least recently used)
+        cache of parsed expressions and, unless the parameter
+        :parameter:`use_cache` is set to ``False``, the parsed trees are
+        first looked up in this cache and, if present, a clone is returned.
+        The size of the cache can be set using :func:`set_parse_cache_size`.
+
+        Expressions which are not in the cache but are present in a bundle
+        loaded by :func:`load_bundle` are not parsed but loaded from the bundle.
     """
-    if (expr, trailing_garbage_ok) in _PARSE_CACHE and use_cache:
-        ast, pos = _PARSE_CACHE[(expr, trailing_garbage_ok)]
-        return ast.clone(), pos
-    token_stream = tokenize(expr)
-    ast, _etok, pos = _parse(token_stream, trailing_garbage_ok=trailing_garbage_ok)
+    key = (expr, trailing_garbage_ok)
+    if use_cache:
+        cached = _PARSE_CACHE.get(key)
+        if cached is not None:
+            ast, pos = cached
+            return ast.clone(), pos
+    bundled = _BUNDLE.get((ET_EXPRESSION, expr, trailing_garbage_ok), None)
+    if bundled is not None:
+        pos, tree = bundled
+        ast = load_ast(tree)
+    else:
+        token_stream = tokenize(expr)
+        ast, _etok, pos = _parse(token_stream, trailing_garbage_ok=trailing_garbage_ok)
+        ast = simplify(ast)
     if use_cache:
-        _PARSE_CACHE[(expr, True)] = ast, pos
+        # The cached tree is never bound, so that it does not keep
+        # the context (and the observed data) alive
+        _PARSE_CACHE[key] = ast, pos
+        return ast.clone(), pos
     return ast, pos
 
 
@@ -1265,7 +2288,7 @@ def _parse(token_stream, end_tokens=[], trailing_garbage_ok=False):
                 partial_eval(arg_stack, op_stack)
                 if len(arg_stack) > 2 or len(op_stack) > 0:
                     raise Exception("Invalid expression, leftovers: args:"+str(arg_stack)+"ops:"+str(op_stack))
-                return arg_stack[0], None, pos
+                return arg_stack[0], None, save_pos
             else:
                 raise Exception("Unexpected token "+str((token, val))+" at "+str(pos))
         if not prev_token_set:
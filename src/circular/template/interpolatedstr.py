@@ -4,11 +4,61 @@
     instances of ``{{ }}``-type circular expressions.
 """
 try:
+    from ..utils.cache import LRUCache
     from ..utils.events import EventMixin
 except:
+    from circular.utils.cache import LRUCache
     from circular.utils.events import EventMixin
 
-from .expression import parse_interpolated_str
+from .expression import interpolated_str_parts
+
+
+class StrTemplate(object):
+    """
+        The compiled form of an interpolated string, shared by all of the
+        :class:`InterpolatedStr`-s created for the string (and their clones).
+        It consists of the asts of the expressions filling the slots between
+        the literal segments and of a format string which joins the literal
+        segments with the values of the expressions.
+
+        The template is never modified (nor bound to a context): each
+        :class:`InterpolatedStr` binds its own clones of the expressions.
+    """
+    __slots__ = ['src', 'exprs', 'fmt']
+
+    def __init__(self, src):
+        self.src = src
+        self.exprs = []
+        fmt = []
+        for part in interpolated_str_parts(src):
+            if isinstance(part, str):
+                fmt.append(part.replace('%', '%%'))
+            else:
+                self.exprs.append(part)
+                fmt.append('%s')
+        self.fmt = "".join(fmt)
+
+    @classmethod
+    def get(cls, src):
+        """
+            Returns the template for the interpolated string :param:`src`,
+            which is only compiled if it is not in the template cache.
+        """
+        template = _TEMPLATES.get(src)
+        if template is None:
+            template = cls(src)
+            _TEMPLATES[src] = template
+        return template
+
+    def render(self, values):
+        """
+            Returns the string with the slots filled with :param:`values`
+            (the values of the expressions converted to strings).
+        """
+        return self.fmt % tuple(values)
+
+
+_TEMPLATES = LRUCache(maxsize=1024)
 
 
 class InterpolatedStr(EventMixin):
@@ -34,25 +84,28 @@ class InterpolatedStr(EventMixin):
         (e.g. c.name='Anne' would not affect the second expresssion in
         the above example).
 
+        The parsed string is kept in a :class:`StrTemplate` shared by the
+        clones, each clone only has its own copies of the expressions
+        and the vector of their values.
     """
 
     def __init__(self, string):
         super().__init__()
         if isinstance(string, InterpolatedStr):
             # pylint: disable=protected-access; we are cloning ourselves, we have access to protected variables
-            self._src = string._src
-            self.asts = []
-            for ast in string.asts:
-                self.asts.append(ast.clone())
+            self._template = string._template
         else:
-            self._src = string
-            self.asts = parse_interpolated_str(string)
+            self._template = StrTemplate.get(string)
+        self._src = self._template.src
+        self.asts = [ast.clone() for ast in self._template.exprs]
 
         for ast_index in range(len(self.asts)):
-            self.asts[ast_index].bind('change', lambda event, ast_index=ast_index: self._change_chandler(event, ast_index))
+            self.asts[ast_index].bind('change', lambda data, ast_index=ast_index: self._change_chandler(data, ast_index),
+                                      lean=True)
 
         self._dirty = True
-        self._dirty_vals = True
+        # The indices of the expressions which need to be reevaluated
+        self._dirty_vals = set()
         self._cached_vals = []
         self._cached_val = ""
         self.evaluate()
@@ -61,17 +114,18 @@ class InterpolatedStr(EventMixin):
         for ast in self.asts:
             ast.bind_ctx(context)
         self._dirty = True
+        self._dirty_vals = set(range(len(self.asts)))
         self._cached_val = ""
 
     def clone(self):
         return InterpolatedStr(self)
 
-    def _change_chandler(self, event, ast_index):
-        if not self._dirty_vals:
-            if 'value' in event.data:
-                self._cached_vals[ast_index] = event.data['value']
+    def _change_chandler(self, data, ast_index):
+        if ast_index not in self._dirty_vals:
+            if 'value' in data:
+                self._cached_vals[ast_index] = self._str(data['value'])
             else:
-                self._dirty_vals = True
+                self._dirty_vals.add(ast_index)
         if self._dirty:
             return
         self._dirty = True
@@ -80,20 +134,33 @@ class InterpolatedStr(EventMixin):
     @property
     def value(self):
         if self._dirty:
-            if self._dirty_vals:
-                self.evaluate()
-            else:
-                self._cached_val = "".join(self._cached_vals)
+            for ast_index in self._dirty_vals:
+                self._cached_vals[ast_index] = self._eval_ast(ast_index)
+            self._dirty_vals = set()
+            self._cached_val = self._template.render(self._cached_vals)
+            self._dirty = False
         return self._cached_val
 
+    def _eval_ast(self, ast_index):
+        try:
+            return str(self.asts[ast_index].eval())
+            # pylint: disable=bare-except; interpolated str must handle any exceptions when evaluating circular expressions
+        except:
+            return ""
+
+    @staticmethod
+    def _str(val):
+        """
+            Returns the string the value :param:`val` of an expression is rendered as.
+        """
+        try:
+            return str(val)
+            # pylint: disable=bare-except; as in :meth:`_eval_ast`, the conversion may fail in arbitrary ways
+        except:
+            return ""
+
     def evaluate(self):
-        self._cached_val = ""
-        self._cached_vals = []
-        for ast in self.asts:
-            try:
-                self._cached_vals.append(ast.eval())
-                # pylint: disable=bare-except; interpolated str must handle any exceptions when evaluating circular expressions
-            except:
-                self._cached_vals.append("")
-        self._cached_val = "".join(self._cached_vals)
+        self._cached_vals = [self._eval_ast(ast_index) for ast_index in range(len(self.asts))]
+        self._dirty_vals = set()
+        self._cached_val = self._template.render(self._cached_vals)
         self._dirty = False
@@ -18,14 +18,125 @@
 
     Where the last line will result in a call to the change_handler.
 
+    Many changes can be grouped using the :func:`batch` context manager,
+    in which case the handlers are notified only once per observed object,
+    after the last change:
+
+    ```
+        with batch():
+            for i in range(1000):
+                a.append(i)
+    ```
+
     WARNING: Only user-defined classes may be observed, not plain lists, dicts, etc.
     The module provides simple wrappers around ``dict`` (:class:`DictProxy`) and ``list``
-    (:class:`ListProxy`) which can be observed.
+    (:class:`ListProxy`) which can be observed. Long numeric series are better stored
+    in an :class:`ArrayProxy`, which keeps the numbers unboxed and emits a single
+    ``range`` event per change.
 
 """
+import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
 from circular.utils.events import EventMixin
 
 
+# The nesting level of :func:`batch` blocks being executed
+_BATCH_DEPTH = 0
+
+# The change events emitted during a batch: maps ids of the changed
+# objects to pairs (object, list of change events)
+_BATCH_EVENTS = OrderedDict()
+
+
+@contextmanager
+def batch():
+    """
+        A context manager which delays the change events emitted by observed
+        objects until the end of the block. Then each changed object emits
+        a single change event. If the object changed only once, this is the
+        original event; otherwise it is a ``batch`` event of the form
+
+        ```
+            {
+                'observed_obj': obj,
+                'type': 'batch',
+                'events': [list of the original change events, in order]
+            }
+        ```
+
+        Batches can be nested, the events are emitted at the end of the
+        outermost batch.
+    """
+    global _BATCH_DEPTH
+    _BATCH_DEPTH += 1
+    try:
+        yield
+    finally:
+        _BATCH_DEPTH -= 1
+        if _BATCH_DEPTH == 0:
+            _flush_batch()
+
+
+def _flush_batch():
+    global _BATCH_EVENTS
+    pending, _BATCH_EVENTS = _BATCH_EVENTS, OrderedDict()
+    for (obj, events) in pending.values():
+        if len(events) == 1:
+            change_event = events[0]
+        else:
+            change_event = {
+                'observed_obj': obj,
+                'type': 'batch',
+                'events': events
+            }
+        obj._obs____.emit('change', change_event)
+
+
+def _emit_change(obj, change_event):
+    """
+        Emits the change event :param:`change_event` on the observer of :param:`obj`
+        or, if a batch is in progress, saves it for the end of the batch.
+    """
+    if _BATCH_DEPTH == 0:
+        obj._obs____.emit('change', change_event)
+    else:
+        key = id(obj)
+        if key not in _BATCH_EVENTS:
+            _BATCH_EVENTS[key] = (obj, [])
+        _BATCH_EVENTS[key][1].append(change_event)
+
+
+# Maps (mixin, base class) pairs to the observable classes created by :func:`observable_class`
+_OBSERVABLE_CLASSES = {}
+
+
+def observable_class(cls, base_cls, has_dict=True):
+    """
+        Returns the class derived from the mixin :param:`cls` and :param:`base_cls`.
+        The class is only created once for each pair, so that all observed
+        instances of a class share a single observable class.
+
+        Instances of classes using ``__slots__`` (e.g. :class:`Context`) can only
+        change their class to a class with the same layout. So, if the instances
+        of :param:`base_cls` do not have a ``__dict__`` (:param:`has_dict` is ``False``),
+        the class is derived from :param:`base_cls` only and the methods of the mixin
+        are copied into it (which is why :class:`ObjMixin` calls the methods of the
+        original class instead of using ``super()``).
+    """
+    key = (cls, base_cls)
+    if key not in _OBSERVABLE_CLASSES:
+        if has_dict:
+            bases, attrs = (cls, base_cls), {}
+        else:
+            bases = (base_cls,)
+            attrs = {name: val for (name, val) in vars(cls).items() if name not in ['__dict__', '__weakref__']}
+            attrs['__slots__'] = ()
+        _OBSERVABLE_CLASSES[key] = type("Observable" + base_cls.__name__, bases, attrs)
+    return _OBSERVABLE_CLASSES[key]
+
+
 def extend_instance(obj, cls):
     """
         Apply mixins to a class instance after creation
@@ -33,9 +144,8 @@ def extend_instance(obj, cls):
     """
 
     base_cls = obj.__class__
-    base_cls_name = obj.__class__.__name__
-    obj.__class__ = type("Observable" + base_cls_name, (cls, base_cls), {})
     obj._orig_class = base_cls
+    obj.__class__ = observable_class(cls, base_cls, has_dict=hasattr(obj, '__dict__'))
 
 
 class ObjMixin(object):
@@ -44,13 +154,15 @@ class ObjMixin(object):
         the various methods which could change the object
         to emit an change event before calling the original method.
     """
-
     def _create_observer(self):
         if not hasattr(self, '_obs____'):
             self._obs____ = EventMixin()
 
     def __setattr__(self, name, value):
         if not name.startswith('_'):
+            if not self._obs____.has_listeners('change'):
+                self._orig_class.__setattr__(self, name, value)
+                return
             change_event = {
                 'observed_obj': self,
                 'type': '__setattr__',
@@ -59,13 +171,16 @@ class ObjMixin(object):
             }
             self._orig_class.__setattr__(self, name, value)
             # super().__setattr__(name,value)
-            self._obs____.emit('change', change_event)
+            _emit_change(self, change_event)
         else:
-            # self._orig_class.__setattr__(self,name,value)
-            super().__setattr__(name, value)
+            # Not using super(), see :func:`observable_class`
+            self._orig_class.__setattr__(self, name, value)
 
     def __delattr__(self, name):
         if not name.startswith('_'):
+            if not self._obs____.has_listeners('change'):
+                self._orig_class.__delattr__(self, name)
+                return
             change_event = {
                 'observed_obj': self,
                 'type': '__delattr__',
@@ -75,9 +190,9 @@ class ObjMixin(object):
                 change_event['old'] = getattr(self, name)
             self._orig_class.__delattr__(self, name)
             # super().__delattr__(name)
-            self._obs____.emit('change', change_event)
+            _emit_change(self, change_event)
         else:
-            super().__delattr__(name)
+            self._orig_class.__delattr__(self, name)
 
 
 class ArrayMixin(object):
@@ -85,6 +200,15 @@ class ArrayMixin(object):
         A mixin for observing an list/dict style classes. Modifies
         the various methods which could change the object
         to emit an change event before calling the original method.
+
+        If nobody listens to the change events, the methods just call
+        the original method, without constructing the events.
+
+        Assigning to (or deleting) a slice emits a single ``range`` event
+        (see :class:`RangeMixin`) which additionally contains the replaced
+        items under the ``old`` key. Extended slices (with a step) emit
+        ``__setitem__`` (``__delitem__``) events for the individual items
+        in a single batch.
     """
 
     def _create_observer(self):
@@ -93,6 +217,9 @@ class ArrayMixin(object):
 
     def __setattr__(self, name, value):
         if not name.startswith('_'):
+            if not self._obs____.has_listeners('change'):
+                self._orig_class.__setattr__(self, name, value)
+                return
             change_event = {
                 'observed_obj': self,
                 'type': '__setattr__',
@@ -103,11 +230,24 @@ class ArrayMixin(object):
                 change_event['old'] = getattr(self, name)
             self._orig_class.__setattr__(self, name, value)
             # super().__setattr__(name,value)
-            self._obs____.emit('change', change_event)
+            _emit_change(self, change_event)
         else:
             super().__setattr__(name, value)
 
+    def _range_event(self, start, stop, values):
+        return {
+            'observed_obj': self,
+            'type': 'range',
+            'start': start,
+            'stop': stop,
+            'values': values
+        }
+
     def __setitem__(self, key, value):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.__setitem__(self, key, value)
+        if isinstance(key, slice):
+            return self._set_slice(key, value)
         change_event = {
             'observed_obj': self,
             'type': '__setitem__',
@@ -120,9 +260,61 @@ class ArrayMixin(object):
             pass
         self._orig_class.__setitem__(self, key, value)
         # super().__setitem__(key,value)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
+
+    def _set_slice(self, key, value):
+        start, stop, step = key.indices(len(self))
+        values = list(value)
+        if step != 1:
+            indexes = range(start, stop, step)
+            old = [self[index] for index in indexes]
+            self._orig_class.__setitem__(self, key, values)
+            with batch():
+                for (index, old_val) in zip(indexes, old):
+                    _emit_change(self, {
+                        'observed_obj': self,
+                        'type': '__setitem__',
+                        'key': index,
+                        'value': self[index],
+                        'old': old_val
+                    })
+            return
+        stop = max(start, stop)
+        old = self[start:stop]
+        self._orig_class.__setitem__(self, key, values)
+        # The event carries the stored items (e.g. the proxies wrapping
+        # assigned lists and dicts) rather than the assigned values
+        change_event = self._range_event(start, stop, self[start:start + len(values)])
+        change_event['old'] = old
+        _emit_change(self, change_event)
+
+    def _del_slice(self, key):
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            # Delete from the end, so that the indexes of the remaining items do not change
+            indexes = sorted(range(start, stop, step), reverse=True)
+            old = [self[index] for index in indexes]
+            self._orig_class.__delitem__(self, key)
+            with batch():
+                for (index, old_val) in zip(indexes, old):
+                    _emit_change(self, {
+                        'observed_obj': self,
+                        'type': '__delitem__',
+                        'key': index,
+                        'old': old_val
+                    })
+            return
+        stop = max(start, stop)
+        change_event = self._range_event(start, stop, [])
+        change_event['old'] = self[start:stop]
+        self._orig_class.__delitem__(self, key)
+        _emit_change(self, change_event)
 
     def __delitem__(self, key):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.__delitem__(self, key)
+        if isinstance(key, slice):
+            return self._del_slice(key)
         change_event = {
             'observed_obj': self,
             'type': '__delitem__',
@@ -134,9 +326,11 @@ class ArrayMixin(object):
             pass
         self._orig_class.__delitem__(self, key)
         # super().__delitem__(key)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def append(self, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.append(self, item)
         change_event = {
             'observed_obj': self,
             'type': 'append',
@@ -145,9 +339,11 @@ class ArrayMixin(object):
         }
         self._orig_class.append(self, item)
         # super().append(item)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def insert(self, index, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.insert(self, index, item)
         change_event = {
             'observed_obj': self,
             'type': 'insert',
@@ -156,19 +352,27 @@ class ArrayMixin(object):
         }
         self._orig_class.insert(self, index, item)
         # super().insert(index,item)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def remove(self, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.remove(self, item)
         change_event = {
             'observed_obj': self,
             'type': 'remove',
             'value': item
         }
+        try:
+            change_event['index'] = self.index(item)
+        except ValueError:
+            pass
         self._orig_class.remove(self, item)
         # super().remove(item)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def clear(self):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.clear(self)
         change_event = {
             'observed_obj': self,
             'type': 'clear',
@@ -176,9 +380,13 @@ class ArrayMixin(object):
         }
         self._orig_class.clear(self)
         # super().clear()
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def extend(self, lst):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.extend(self, lst)
+        # The items are needed by the listeners, so a one-shot iterable must be consumed only once
+        lst = list(lst)
         change_event = {
             'observed_obj': self,
             'type': 'extend',
@@ -186,9 +394,11 @@ class ArrayMixin(object):
         }
         self._orig_class.extend(self, lst)
         # super().extend(lst)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def update(self, dct, **kwargs):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.update(self, dct)
         change_event = {
             'observed_obj': self,
             'type': 'extend',
@@ -197,9 +407,11 @@ class ArrayMixin(object):
         }
         self._orig_class.update(self, dct)
         # super().update(dct)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
 
     def pop(self, *args):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.pop(self, *args)
         if len(args) > 0:
             index = args[0]
         else:
@@ -211,61 +423,338 @@ class ArrayMixin(object):
         }
         change_event['old'] = self._orig_class.pop(self, *args)
         # change_event['old']=super().pop(*args)
-        self._obs____.emit('change', change_event)
+        _emit_change(self, change_event)
         return change_event['old']
 
-    def sort(self, *args, **kwargs):
-        self._orig_class.sort(self, *args, **kwargs)
-        # super().sort(*args,**kwargs)
-        self._obs____.emit('change', {'type': 'sort'})
+    def sort(self, key=None, reverse=False):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.sort(self, key=key, reverse=reverse)
+        # The event carries the applied permutation, i.e.
+        # ``permutation[new_index] == old_index``, so that
+        # listeners can reorder whatever they derived from
+        # the items instead of recomputing it. The list is
+        # reordered by the permutation (instead of sorting
+        # it again), so that it is guaranteed to match it.
+        items = list(self)
+        if key is None:
+            sort_key = items.__getitem__
+        else:
+            sort_key = lambda index: key(items[index])
+        permutation = sorted(range(len(items)), key=sort_key, reverse=reverse)
+        self._orig_class.__setitem__(self, slice(None), [items[index] for index in permutation])
+        _emit_change(self, {
+            'observed_obj': self,
+            'type': 'sort',
+            'permutation': permutation
+        })
 
     def reverse(self, *args, **kwargs):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.reverse(self, *args, **kwargs)
+        permutation = list(range(len(self)-1, -1, -1))
         self._orig_class.reverse(self, *args, **kwargs)
         # super().reverse(*args,**kwargs)
-        self._obs____.emit('change', {'type': 'reverse'})
+        _emit_change(self, {
+            'observed_obj': self,
+            'type': 'reverse',
+            'permutation': permutation
+        })
+
+
+class RangeMixin(ArrayMixin):
+    """
+        A mixin for observing an :class:`ArrayProxy`. Instead of an event
+        per element, each change emits a single ``range`` event
+
+        ```
+            {
+                'observed_obj': obj,
+                'type': 'range',
+                'start': start,
+                'stop': stop,
+                'values': values
+            }
+        ```
+
+        meaning that the items ``obj[start:stop]`` were replaced by ``values``.
+    """
+
+    def _index(self, index, insert=False):
+        """
+            Returns the nonnegative index corresponding to :param:`index`. If
+            :param:`insert` is ``True``, the index is clamped to the valid
+            positions for insertion (as ``insert`` does).
+        """
+        size = len(self)
+        if index < 0:
+            index += size
+        if insert:
+            return min(max(index, 0), size)
+        if not 0 <= index < size:
+            raise IndexError("array index out of range")
+        return index
+
+    def __setitem__(self, key, value):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.__setitem__(self, key, value)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            values = array.array(self.typecode, value)
+            # Raises (without changing anything) if the lengths of an extended slice and the values differ
+            self._orig_class.__setitem__(self, key, values)
+            if step != 1:
+                # Extended slices are reported item by item
+                with batch():
+                    for (index, val) in zip(range(start, stop, step), values):
+                        _emit_change(self, self._range_event(index, index + 1, array.array(self.typecode, [val])))
+                return
+            _emit_change(self, self._range_event(start, max(start, stop), values))
+        else:
+            index = self._index(key)
+            self._orig_class.__setitem__(self, index, value)
+            _emit_change(self, self._range_event(index, index + 1, array.array(self.typecode, [value])))
+
+    def __delitem__(self, key):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.__delitem__(self, key)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                indexes = sorted(range(start, stop, step), reverse=True)
+                with batch():
+                    for index in indexes:
+                        del self[index]
+                return
+        else:
+            start = self._index(key)
+            stop = start + 1
+        self._orig_class.__delitem__(self, key)
+        _emit_change(self, self._range_event(start, max(start, stop), array.array(self.typecode)))
+
+    def append(self, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.append(self, item)
+        size = len(self)
+        self._orig_class.append(self, item)
+        _emit_change(self, self._range_event(size, size, self[size:]))
+
+    def extend(self, lst):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.extend(self, lst)
+        values = array.array(self.typecode, lst)
+        size = len(self)
+        self._orig_class.extend(self, values)
+        _emit_change(self, self._range_event(size, size, values))
+
+    def __iadd__(self, lst):
+        self.extend(lst)
+        return self
+
+    def insert(self, index, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.insert(self, index, item)
+        index = self._index(index, insert=True)
+        self._orig_class.insert(self, index, item)
+        _emit_change(self, self._range_event(index, index, self[index:index+1]))
+
+    def pop(self, index=-1):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.pop(self, index)
+        index = self._index(index)
+        ret = self._orig_class.pop(self, index)
+        _emit_change(self, self._range_event(index, index + 1, array.array(self.typecode)))
+        return ret
+
+    def remove(self, item):
+        if not self._obs____.has_listeners('change'):
+            return self._orig_class.remove(self, item)
+        index = self.index(item)
+        self._orig_class.__delitem__(self, index)
+        _emit_change(self, self._range_event(index, index + 1, array.array(self.typecode)))
+
+
+def _needs_proxy(val):
+    """
+        Returns ``True`` if :param:`val` is a list or a dict which is not
+        wrapped in a proxy.
+    """
+    return isinstance(val, (list, dict)) and not isinstance(val, (ListProxy, DictProxy))
+
+
+def _proxy(val):
+    """
+        Wraps :param:`val` in a proxy if it is a list or a dict.
+    """
+    if not _needs_proxy(val):
+        return val
+    if isinstance(val, list):
+        return ListProxy(val)
+    return DictProxy(val)
 
 
 class ListProxy(list):
     """
         A wrapper around list objects for making them observable
+
+        Only the list itself is copied, nested lists and dicts are
+        wrapped in proxies lazily, when they are first accessed.
     """
 
+    # Whether the list may contain lists or dicts which are not wrapped yet
+    _lazy = True
+
     def __init__(self, lst):
-        this = []
-        for item in lst:
-            if isinstance(item, list):
-                this.append(ListProxy(item))
-            elif isinstance(item, dict):
-                this.append(DictProxy(item))
-            else:
-                this.append(item)
-        super().__init__(this)
+        super().__init__(lst)
+
+    def _wrap(self, index, item):
+        """
+            Wraps the :param:`item` stored at :param:`index` (if needed) and
+            replaces it by the proxy.
+        """
+        if _needs_proxy(item):
+            item = _proxy(item)
+            list.__setitem__(self, index, item)
+        return item
+
+    def _wrapping_iter(self):
+        for index, item in enumerate(list.__iter__(self)):
+            yield self._wrap(index, item)
+        self._lazy = False
+
+    def __iter__(self):
+        if self._lazy:
+            return self._wrapping_iter()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[index] for index in range(len(self))[key]]
+        return self._wrap(key, list.__getitem__(self, key))
+
+    def __setitem__(self, key, value):
+        list.__setitem__(self, key, value)
+        if not self._lazy and (isinstance(key, slice) or _needs_proxy(value)):
+            self._lazy = True
+
+    def append(self, item):
+        list.append(self, item)
+        if not self._lazy and _needs_proxy(item):
+            self._lazy = True
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        if not self._lazy and _needs_proxy(item):
+            self._lazy = True
+
+    def extend(self, lst):
+        list.extend(self, lst)
+        if not self._lazy:
+            self._lazy = True
+
+    def pop(self, *args):
+        return _proxy(list.pop(self, *args))
 
 
 class DictProxy(dict):
     """
         A wrapper around dict objects for making them observable
+
+        Only the dict itself is copied, nested lists and dicts are
+        wrapped in proxies lazily, when they are first accessed.
     """
 
-    def __init__(self, dct):
-        this = {}
-        for key, val in dct.items():
-            if isinstance(val, list):
-                this[key] = ListProxy(val)
-            elif isinstance(val, dict):
-                this[key] = DictProxy(val)
-            else:
-                this[key] = val
-        super().__init__(this)
+    # Whether the dict may contain lists or dicts which are not wrapped yet
+    _lazy = True
 
+    def __init__(self, dct):
+        super().__init__(dct)
+
+    def _wrap(self, key, val):
+        """
+            Wraps the value :param:`val` stored under :param:`key` (if needed)
+            and replaces it by the proxy.
+        """
+        if _needs_proxy(val):
+            val = _proxy(val)
+            dict.__setitem__(self, key, val)
+        return val
+
+    def _wrap_all(self):
+        if self._lazy:
+            for key, val in dict.items(self):
+                self._wrap(key, val)
+            self._lazy = False
+
+    def __getitem__(self, key):
+        return self._wrap(key, dict.__getitem__(self, key))
+
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, val)
+        if not self._lazy and _needs_proxy(val):
+            self._lazy = True
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        return self._wrap(key, dict.setdefault(self, key, default))
+
+    def values(self):
+        self._wrap_all()
+        return dict.values(self)
+
+    def items(self):
+        self._wrap_all()
+        return dict.items(self)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        if not self._lazy:
+            self._lazy = True
+
+    def pop(self, key, *args):
+        return _proxy(dict.pop(self, key, *args))
+
+
+class ArrayProxy(array.array):
+    """
+        An observable sequence of numbers stored (unboxed) in an ``array.array``,
+        e.g. ``ArrayProxy('d', [0.5, 1.5])``. When observed, each change emits
+        a single ``range`` event (see :class:`RangeMixin`) instead of an event
+        per element, which makes it suitable for long, streamed series.
+    """
 
-def observe(obj, observer=None, ignore_errors=False):
+    def shift(self, values):
+        """
+            Shifts the window: appends :param:`values` and removes the same
+            number of items from the start, so that the length stays the same.
+            Observers are notified by a single ``batch`` event consisting of
+            the two ``range`` events.
+        """
+        values = array.array(self.typecode, values)
+        if len(values) > len(self):
+            values = values[len(values)-len(self):]
+        with batch():
+            del self[:len(values)]
+            self.extend(values)
+
+
+def observe(obj, observer=None, ignore_errors=False, weak=False):
     """
         Returns an observer object monitoring changes to ``obj``.
 
         One can specify any instance of EventMixin as the ``observer``
         parameter. In this case any change events will be emitted
-        (forwarded) by the provided observer.
+        (forwarded) by the provided observer. If ``observer`` is a
+        bound method and ``weak`` is ``True``, it is bound weakly
+        (see :meth:`EventMixin.bind`), so that observing ``obj`` does
+        not keep the object the method belongs to alive.
 
         If ``ignore_errors`` is False, the method may throw, e.g. if
         the user tries to observe a built in type. Otherwise it will
@@ -285,7 +774,9 @@ def observe(obj, observer=None, ignore_errors=False):
             else:
                 return None
         try:
-            if hasattr(obj, '__setitem__'):
+            if isinstance(obj, ArrayProxy):
+                extend_instance(obj, RangeMixin)
+            elif hasattr(obj, '__setitem__'):
                 extend_instance(obj, ArrayMixin)
             else:
                 extend_instance(obj, ObjMixin)
@@ -297,5 +788,55 @@ def observe(obj, observer=None, ignore_errors=False):
             else:
                 return None
     if observer is not None:
-        obj._obs____.bind('change', observer, 'change')
+        obj._obs____.bind('change', observer, 'change', weak=weak)
     return obj._obs____
+
+
+class ListWatcherMixin(object):
+    """
+        A mixin for objects which keep something derived from a list (the source)
+        up to date by replaying the change events the list emitted since (e.g.
+        :class:`ListComprNode`, :class:`For`). The classes using it must initialize
+        the ``_src`` (the watched list), ``_src_subscription`` and ``_src_events``
+        (the change events emitted since the last update) attributes to ``None``,
+        ``None`` and ``[]`` respectively.
+    """
+
+    def _watch_src(self, lst):
+        """
+            Starts watching :param:`lst` for change events, if it is a list or an
+            :class:`ArrayProxy` which can be observed. Returns ``True`` if it is
+            watched. (The previous source must have been unwatched before)
+        """
+        if isinstance(lst, (list, ArrayProxy)):
+            observer = observe(lst, ignore_errors=True)
+            if observer is not None:
+                self._src_subscription = observer.bind('change', self._src_change, weak=True, lean=True)
+                self._src = lst
+                return True
+        return False
+
+    def _src_change(self, data):
+        """
+            Saves the change event :param:`data` emitted by the watched list. Returns
+            ``False`` if the event comes from a different (e.g. a nested) list.
+        """
+        if data.get('observed_obj', self._src) is not self._src:
+            return False
+        self._src_events.append(data)
+        return True
+
+    def _watching(self):
+        """
+            Returns ``True`` if the change events of the list are still delivered to
+            :meth:`_src_change`. (Other code may have unbound all the handlers
+            of the list's observer)
+        """
+        return self._src_subscription is not None and self._src_subscription.active
+
+    def _unwatch_src(self):
+        if self._src_subscription is not None:
+            self._src_subscription.unbind()
+            self._src_subscription = None
+        self._src = None
+        self._src_events = []
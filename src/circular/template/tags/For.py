@@ -2,24 +2,27 @@
     Provides the For template plugin for looping constructs.
 """
 import re
+from itertools import repeat
 from logging import getLogger
 
 
 try:
     from ..tpl import _compile, register_plugin
     from ..expression import parse
-    from ..context import Context
+    from ..context import LoopScope
+    from ..observer import ListWatcherMixin
 except:
     from circular.template.tpl import _compile, register_plugin
     from circular.template.expression import parse
-    from circular.template.context import Context
+    from circular.template.context import LoopScope
+    from circular.template.observer import ListWatcherMixin
 
 from .tag import TagPlugin
 
 logger = getLogger(__name__)
 
 
-class For(TagPlugin):
+class For(ListWatcherMixin, TagPlugin):
     """
         The template plugin `For` is used to generate a list of DOM elements.
         When a dom-element has the `for` attribute set it should be of the form
@@ -52,6 +55,10 @@ class For(TagPlugin):
             <li>3</li>
             <li>4</li>
         ```
+        When the list is only reordered (by ``sort`` or ``reverse``), the already
+        rendered elements are reordered to match instead of being re-rendered.
+        Similarly, when a range of items of an :class:`ArrayProxy` is replaced,
+        only the elements for the new items are rendered.
     """
     SPEC_RE = re.compile(r'^\s*(?P<loop_var>[^ ]*)\s*in\s*(?P<sequence_exp>.*)$', re.IGNORECASE)
     COND_RE = re.compile(r'\s*if\s(?P<condition>.*)$', re.IGNORECASE)
@@ -82,12 +89,20 @@ class For(TagPlugin):
                 self._cond = None
             self.children = []
             self.child_template = _compile(tpl_element)
+        # The list the children were rendered for, the change events it emitted
+        # since and, for each of its items, the rendered child (or None if the
+        # item does not satisfy the condition)
+        self._src = None
+        self._src_subscription = None
+        self._src_events = []
+        self._src_children = []
         self._exp.bind('change', self._self_change_chandler)
 
     def _clear(self):
         for (child, _elem) in self.children:
             child.unbind()
         self.children = []
+        self._unwatch_src()
 
     def bind_ctx(self, ctx):
         super().bind_ctx(ctx)
@@ -101,44 +116,151 @@ class For(TagPlugin):
             logger.warn("Exception %s when computing list %s with context %s",
                         str(exc), str(self._exp), str(self._ctx))
             lst = []
+        self._src_children = self._render(lst)
+        self.children = [child for child in self._src_children if child is not None]
+        self._watch_src(lst)
+        return [elem for (_child, elem) in self.children]
+
+    def _render(self, items):
+        """
+            Renders the children for :param:`items`. Returns a list containing,
+            for each item, the pair (child, element) or ``None`` if the item
+            does not satisfy the condition (or rendering it failed).
+        """
+        if self._cond is not None:
+            # The items are iterated twice, so they must not be a one-shot iterable
+            items = list(items)
+            keep = self._cond.evalmany(self._ctx, self._var, items, on_error=self._cond_error)
+        else:
+            keep = repeat(True)
         ret = []
-        for item in lst:
-            item_ctx = Context({self._var: item}, base=self._ctx)
+        for (item, keep_item) in zip(items, keep):
+            if not keep_item:
+                ret.append(None)
+                continue
+            item_ctx = LoopScope(self._var, item, self._ctx)
+            clone = self.child_template.clone()
             try:
-                if self._cond is None or self._cond.evalctx(item_ctx):
-                    clone = self.child_template.clone()
-                    elem = clone.bind_ctx(item_ctx)
-                    clone.bind('change', self._subtree_change_handler)
-                    ret.append(elem)
-                    self.children.append((clone, elem))
-            # pylint: disable=broad-except; the For plugin must not choke on exceptions from user conditions; these
+                elem = clone.bind_ctx(item_ctx)
+            # pylint: disable=broad-except; the For plugin must not choke on exceptions from user expressions; these
             #                               can be arbitrary
             except Exception as exc:
-                logger.warn("Exception %s when evaluating condition %s with context %s",
-                            str(exc), str(self._cond), str(item_ctx))
+                logger.warn("Exception %s when rendering %s with %s = %s",
+                            str(exc), str(self.child_template), self._var, str(item))
+                ret.append(None)
+                continue
+            clone.bind('change', self._subtree_change_handler)
+            ret.append((clone, elem))
         return ret
 
+    def _watch_src(self, lst):
+        """
+            Starts watching :param:`lst` for change events so that reordering
+            it or replacing a range of its items does not require re-rendering
+            all of the children.
+        """
+        if super()._watch_src(lst):
+            return True
+        self._src_children = []
+        return False
+
+    def _unwatch_src(self):
+        super()._unwatch_src()
+        self._src_children = []
+
+    def _patch(self):
+        """
+            If the list was only reordered (``sort``, ``reverse``) or had ranges
+            of items replaced (``range`` events) since the children were rendered,
+            updates the children to match and returns ``True``. Otherwise returns
+            ``False`` and the children need to be re-rendered.
+        """
+        if self._src is None or not self._watching():
+            return False
+        try:
+            if self._exp.eval() is not self._src:
+                return False
+        # pylint: disable=broad-except; see bind_ctx
+        except Exception:
+            return False
+        events = self._flat_events(self._src_events)
+        # Check that all of the events can be handled before rendering anything
+        size = len(self._src_children)
+        for event in events:
+            if event['type'] == 'range':
+                size += len(event['values']) - (event['stop'] - event['start'])
+            elif 'permutation' not in event or len(event['permutation']) != size:
+                return False
+        src_children = self._src_children
+        for event in events:
+            if event['type'] == 'range':
+                start, stop = event['start'], event['stop']
+                for entry in src_children[start:stop]:
+                    if entry is not None:
+                        entry[0].unbind()
+                src_children[start:stop] = self._render(event['values'])
+            else:
+                src_children = [src_children[i] for i in event['permutation']]
+        self._src_events = []
+        self._src_children = src_children
+        self.children = [child for child in src_children if child is not None]
+        return True
+
+    @classmethod
+    def _flat_events(cls, events):
+        """ Returns the list of :param:`events` with ``batch`` events replaced by their parts. """
+        ret = []
+        for event in events:
+            if event['type'] == 'batch':
+                ret.extend(cls._flat_events(event['events']))
+            else:
+                ret.append(event)
+        return ret
+
+    def _cond_error(self, exc, item):
+        """
+            Called when evaluating the condition for :param:`item` raises
+            :param:`exc`. Such items are skipped.
+        """
+        logger.warn("Exception %s when evaluating condition %s with %s = %s",
+                    str(exc), str(self._cond), self._var, str(item))
+        return False
+
     def update(self):
         if self._dirty_self and self._bound:
-            return self.bind_ctx(self._ctx)
+            if not self._patch():
+                return self.bind_ctx(self._ctx)
+            self._dirty_self = False
+            return self._update_children(patched=True)
         elif self._dirty_subtree:
-            self._dirty_subtree = False
-            ret = []
-            have_new = False
-            for (child, elem) in self.children:
-                new_elem = child.update()
-                if new_elem is not None:
-                    ret.append(new_elem)
-                    have_new = True
-                else:
-                    ret.append(elem)
-            if have_new:
-                return ret
+            return self._update_children()
+
+    def _update_children(self, patched=False):
+        """
+            Updates the children and returns the list of their elements
+            if any of them changed (or if they were :param:`patched`).
+        """
+        self._dirty_subtree = False
+        ret = []
+        replaced = {}
+        for (child, elem) in self.children:
+            new_elem = child.update()
+            if new_elem is not None:
+                replaced[id(child)] = (child, new_elem)
+                elem = new_elem
+            ret.append(elem)
+        if replaced:
+            self.children = [replaced.get(id(child), (child, elem)) for (child, elem) in self.children]
+            self._src_children = [
+                None if entry is None else replaced.get(id(entry[0]), entry) for entry in self._src_children
+            ]
+        if replaced or patched:
+            return ret
 
     def __repr__(self):
         ret = "<For " + self._var + " in " + str(self._exp)
         if self._cond is not None:
-            ret += " if " + self._cond
+            ret += " if " + str(self._cond)
         ret += ">"
         return ret
 
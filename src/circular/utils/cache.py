@@ -0,0 +1,101 @@
+"""
+    The cache module provides the :class:`LRUCache` class, a size-bounded
+    mapping which evicts the least recently used entries and keeps
+    statistics about its usage.
+"""
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+        A dict-like cache holding at most :attribute:`maxsize` items. When
+        a new item is stored in a full cache, the least recently used item
+        is evicted. Use it as follows:
+
+        ```
+            cache = LRUCache(maxsize=2)
+            cache['a'] = 1
+            cache['b'] = 2
+            cache.get('a')          # Returns 1 and marks 'a' as recently used
+            cache['c'] = 3          # Evicts 'b'
+            assert 'b' not in cache
+            assert cache.stats()['evictions'] == 1
+        ```
+
+        A :attribute:`maxsize` of ``None`` means the cache is unbounded,
+        a :attribute:`maxsize` of ``0`` disables caching.
+    """
+
+    def __init__(self, maxsize=None):
+        self._data = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+            Returns the item stored under :param:`key` (updating its
+            recency) or :param:`default` if it is not present.
+        """
+        try:
+            val = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def __setitem__(self, key, val):
+        if self.maxsize == 0:
+            return
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = val
+        self._evict()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        if self.maxsize is None:
+            return
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """
+            Changes the maximal number of items, evicting
+            items if the cache is too large.
+        """
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self, reset_stats=False):
+        """
+            Removes all items from the cache. If :param:`reset_stats`
+            is ``True``, also resets the counters.
+        """
+        self._data.clear()
+        if reset_stats:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+            Returns a dict with the number of hits, misses and evictions
+            and the current and maximal size of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
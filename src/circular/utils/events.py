@@ -4,7 +4,18 @@
     :method:`emit` methods to the class. The :method:`bind` method registers event
     handlers for different events which are triggered by the :method:`emit`
     method.
+
+    Handlers which are bound methods can be bound weakly (``weak=True``), so
+    that the binding does not keep the object the method belongs to alive.
+
+    Handlers bound with ``lean=True`` are called with the event data instead
+    of an :class:`Event` object. If all handlers of an event are lean, emitting
+    it does not allocate anything, which is what the template machinery uses
+    to propagate changes internally.
 """
+import weakref
+from collections import OrderedDict
+
 
 def generate_forward_handler(obj, forward_event):
     def handler(event):
@@ -12,6 +23,55 @@ def generate_forward_handler(obj, forward_event):
     return handler
 
 
+class WeakHandler:
+    """
+        Wraps the bound method :param:`method` holding only a weak reference to
+        the object it belongs to. Calling the wrapper calls the method, unless
+        the object was garbage collected in the meantime. When that happens,
+        :param:`on_dead` (if provided) is called with the wrapper, e.g. to remove
+        it from a list of handlers.
+
+        The wrapper compares equal to the method, so it can be looked up
+        (and removed) using the method.
+    """
+
+    def __init__(self, method, on_dead=None):
+        self._func = method.__func__
+        if on_dead is None:
+            self._obj = weakref.ref(method.__self__)
+        else:
+            self._obj = weakref.ref(method.__self__, lambda ref: on_dead(self))
+
+    @property
+    def alive(self):
+        return self._obj() is not None
+
+    def __call__(self, *args, **kwargs):
+        obj = self._obj()
+        if obj is not None:
+            return self._func(obj, *args, **kwargs)
+
+    def __eq__(self, other):
+        if isinstance(other, WeakHandler):
+            return other is self
+        obj = self._obj()
+        return obj is not None and getattr(other, '__self__', None) is obj and getattr(other, '__func__', None) is self._func
+
+    def __repr__(self):
+        return "<WeakHandler " + self._func.__name__ + " of " + repr(self._obj()) + ">"
+
+
+def weak_handler(handler, on_dead=None):
+    """
+        Returns a :class:`WeakHandler` wrapping :param:`handler` if it is a bound
+        method. Other handlers (functions, lambdas, ...) are returned unchanged,
+        since nothing else would keep them alive.
+    """
+    if hasattr(handler, '__self__') and hasattr(handler, '__func__'):
+        return WeakHandler(handler, on_dead)
+    return handler
+
+
 class Event:
     """
         Event class encapsulating user data (:attribute:`data`)
@@ -56,6 +116,39 @@ def add_event_mixin(obj):
     base_cls_name = obj.__class__.__name__
     obj.__class__ = type(base_cls_name, (EventMixin, base_cls), {})
     obj._event_handlers = {}
+    obj._dispatch = {}
+    obj._forwarding_from_objects = []
+
+
+class Subscription:
+    """
+        A handle representing a handler bound to an event of an :class:`EventMixin`
+        (returned by :meth:`EventMixin.bind`). Unbinding the handler using the
+        handle takes constant time.
+    """
+    __slots__ = ['emitter', 'event', 'handler', 'lean']
+
+    def __init__(self, emitter, event, handler, lean):
+        self.emitter = emitter
+        self.event = event
+        self.handler = handler
+        self.lean = lean
+
+    @property
+    def active(self):
+        """
+            Whether the handler is still bound (it could have been unbound
+            by unbinding all handlers of the emitter).
+        """
+        # pylint: disable=protected-access
+        return self in self.emitter._event_handlers.get(self.event, ())
+
+    def unbind(self):
+        """
+            Unbinds the handler (does nothing if it is not bound anymore).
+        """
+        # pylint: disable=protected-access
+        self.emitter._unsubscribe(self)
 
 
 class EventMixin:
@@ -65,25 +158,52 @@ class EventMixin:
     """
 
     def __init__(self):
+        # Maps events to (ordered) dicts whose keys are the subscriptions to the event
         self._event_handlers = {}
+        # Maps events to tuples of (handler, lean) pairs which are called when the
+        # event is emitted. The tuples are rebuilt after the subscriptions change.
+        self._dispatch = {}
         self._forwarding_from_objects = []
 
-    def bind(self, event, handler, forward_event=None):
+    def bind(self, event, handler, forward_event=None, weak=False, lean=False):
         """
            Registers an event handler for event. If :param:`forward_event` is provided
            and handler is an object, registers a handler which emits the
            event :param:`forward_event` on object :param:`handler` whenever the current object
            emits the event :param:`event`.
+
+           If :param:`weak` is ``True`` and the handler is a bound method, only a weak
+           reference to its object is kept (see :class:`WeakHandler`). The handler
+           is unregistered automatically when the object is garbage collected.
+
+           If :param:`lean` is ``True``, the handler is called with the event data
+           instead of an :class:`Event` object.
+
+           Returns a :class:`Subscription` which can be used to unbind the handler.
         """
         # pylint: disable=protected-access
         if forward_event is not None and isinstance(handler, EventMixin):
             generated_handler = generate_forward_handler(handler, forward_event)
             handler._forwarding_from_objects.append((self, generated_handler, event))
             handler = generated_handler
+            lean = False
+        subscription = Subscription(self, event, handler, lean)
+        if weak:
+            subscription.handler = weak_handler(handler, lambda dead_handler: subscription.unbind())
 
         if event not in self._event_handlers:
-            self._event_handlers[event] = []
-        self._event_handlers[event].append(handler)
+            self._event_handlers[event] = OrderedDict()
+        self._event_handlers[event][subscription] = None
+        self._dispatch.pop(event, None)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        subscriptions = self._event_handlers.get(subscription.event)
+        if subscriptions is not None and subscription in subscriptions:
+            del subscriptions[subscription]
+            # The handlers of an emit which is in progress are not affected,
+            # since the dispatch tuple is replaced, not modified
+            self._dispatch.pop(subscription.event, None)
 
     def stop_forwarding(self, only_event=None, only_obj=None):
         """
@@ -113,19 +233,37 @@ class EventMixin:
            If @event is provided and not an EventMixin but @handler is None,
            unregisters all handlers for event @event.
 
-           Otherwise unregisters only the specified @handler from the event @event.
+           Otherwise unregisters only the specified @handler from the event @event
+           (raising ``ValueError`` if it is not registered). Unbinding using the
+           :class:`Subscription` returned by :meth:`bind` is faster.
         """
         if event is None:
             self._event_handlers = {}
+            self._dispatch = {}
             for (obj, handler, event) in self._forwarding_from_objects:
                 obj.unbind(event, handler)
             self._forwarding_from_objects = []
+        elif handler is None:
+            self._event_handlers.pop(event, None)
+            self._dispatch.pop(event, None)
         else:
-            handlers = self._event_handlers.get(event, [])
-            if handler is None:
-                handlers.clear()
-            else:
-                handlers.remove(handler)
+            for subscription in self._event_handlers.get(event, ()):
+                if subscription.handler == handler:
+                    self._unsubscribe(subscription)
+                    return
+            raise ValueError("Handler not bound to " + str(event))
+
+    def is_bound(self, event, handler):
+        """
+            Returns ``True`` if :param:`handler` is registered for :param:`event`.
+        """
+        return any(subscription.handler == handler for subscription in self._event_handlers.get(event, ()))
+
+    def has_listeners(self, event):
+        """
+            Returns ``True`` if there are any handlers registered for :param:`event`.
+        """
+        return bool(self._event_handlers.get(event))
 
     def emit(self, event, event_data=None, _forwarded=False):
         """
@@ -134,17 +272,37 @@ class EventMixin:
             @data attribute will contain @event_data and @targets and @names@
             attribute will be a list of objects on which the event was called
             starting from the first one and going up along the forwarding chain
-            (if forward handlers were registered).
+            (if forward handlers were registered). Lean handlers are passed
+            @event_data itself.
+
+            If no handlers are registered for the event, the method returns
+            immediately. The Event object is only created if there are handlers
+            which are not lean.
 
             NOTE: _forwarded should NOT be set by the users. If is used
             internally by forward handlers to indicate that this is a
             forwarded event.
         """
+        handlers = self._dispatch.get(event)
+        if handlers is None:
+            subscriptions = self._event_handlers.get(event)
+            if not subscriptions:
+                return
+            handlers = tuple((subscription.handler, subscription.lean) for subscription in subscriptions)
+            self._dispatch[event] = handlers
+        event_obj = None
+        data = event_data
         if _forwarded and isinstance(event_data, Event):
-            event_data.retarget(self)
-            event_data.rename(event)
-        else:
-            event_data = Event(event, self, event_data)
-        handlers = self._event_handlers.get(event, [])
-        for handler in handlers:
-            handler(event_data)
+            data = event_data.data
+        for (handler, lean) in handlers:
+            if lean:
+                handler(data)
+                continue
+            if event_obj is None:
+                if data is not event_data:
+                    event_obj = event_data
+                    event_obj.retarget(self)
+                    event_obj.rename(event)
+                else:
+                    event_obj = Event(event, self, event_data)
+            handler(event_obj)
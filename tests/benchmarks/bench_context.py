@@ -0,0 +1,187 @@
+"""
+    Benchmarks for the context module.
+"""
+import tracemalloc
+
+from tests.brython.browser.html import MockElement, MockAttr
+
+import src.circular.template.expression as exp
+from src.circular.template.context import Context, LoopScope
+from src.circular.template.observer import observe
+from src.circular.template.tpl import _compile
+
+from tests.benchmarks.utils import measure, report
+
+
+def bench_dependencies(nodes=5000, assignments=1000):
+    def bound_context(watch):
+        ctx = Context()
+        for i in range(nodes):
+            ctx._set('v%d' % i, i)
+        for i in range(nodes):
+            node, _ = exp.parse('v%d' % i)
+            if watch:
+                node.bind_ctx(ctx)
+            else:
+                # Every node receiving every change and filtering on the key
+                observe(ctx).bind('change', lambda event, name='v%d' % i: event.data['key'] == name)
+        return ctx
+
+    def run(ctx):
+        for i in range(assignments):
+            ctx.v0 = i
+
+    ctx_all = bound_context(watch=False)
+    ctx_watch = bound_context(watch=True)
+    report("%d assignments with %d bound identifiers" % (assignments, nodes), [
+        ('notify all nodes', measure(lambda: run(ctx_all))),
+        ('dependency index', measure(lambda: run(ctx_watch))),
+    ])
+
+
+def _uncached_get(ctx, name):
+    # The lookup walking the whole chain of base contexts (for comparison)
+    if ctx._has_local(name):
+        return ctx._locals()[name]
+    if isinstance(ctx._base, Context):
+        return _uncached_get(ctx._base, name)
+    return ctx._base[name]
+
+
+def bench_nested_lookup(depth=4, lookups=100000, rows=30, cols=30):
+    """
+        Looks up a variable defined in the outermost of :param:`depth` nested
+        contexts and renders a table using nested ``For`` loops whose cells
+        refer to the variables of the outer scopes.
+    """
+    ctx = Context()
+    ctx.title = 'title'
+    leaf = ctx
+    for _ in range(depth - 1):
+        leaf = Context(base=leaf)
+
+    def lookup(get):
+        for _ in range(lookups):
+            get(leaf, 'title')
+
+    def table():
+        doc = MockElement('table')
+        tr_elem = MockElement('tr')
+        tr_elem.attributes.append(MockAttr('for', 'row in rows'))
+        td_elem = MockElement('td')
+        td_elem.attributes.append(MockAttr('for', 'cell in row["cells"]'))
+        text_elem = MockElement('#text')
+        text_elem.text = "{{ cell }}{{ unit }} {{ title }} {{ row['name'] }}"
+        td_elem <= text_elem
+        tr_elem <= td_elem
+        doc <= tr_elem
+        ctx.unit = 'px'
+        ctx.rows = [{'name': str(i), 'cells': list(range(cols))} for i in range(rows)]
+        return _compile(doc)
+
+    def render(get):
+        # The rows are rendered in loop scopes, so their lookup is replaced as well
+        orig_gets = [(cls, cls._get) for cls in (Context, LoopScope)]
+        for (cls, _orig_get) in orig_gets:
+            cls._get = get
+        try:
+            table().bind_ctx(ctx)
+        finally:
+            for (cls, orig_get) in orig_gets:
+                cls._get = orig_get
+
+    def render_cached():
+        table().bind_ctx(ctx)
+
+    report("%d lookups through %d nested contexts" % (lookups, depth), [
+        ('walk the chain', measure(lambda: lookup(_uncached_get))),
+        ('scope cache', measure(lambda: lookup(Context._get))),
+    ])
+    report("Rendering a %dx%d table using nested loops" % (rows, cols), [
+        ('walk the chain', measure(lambda: render(_uncached_get))),
+        ('scope cache', measure(render_cached)),
+    ])
+
+
+def bench_loop_scopes(rows=50000):
+    """
+        Creates the scopes for the rows of a loop (each bound to an expression
+        referring to the loop variable, as the rendered rows are) using full
+        contexts and :class:`LoopScope`-s and compares the time and memory used.
+    """
+    ctx = Context()
+    ctx.rows = list(range(rows))
+    ast, _ = exp.parse("row")
+
+    def scopes(make_scope):
+        ret = []
+        for item in ctx.rows:
+            scope = make_scope(item)
+            node = ast.clone()
+            node.bind_ctx(scope)
+            ret.append((scope, node))
+        return ret
+
+    def memory(make_scope):
+        tracemalloc.start()
+        kept = scopes(make_scope)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return used
+
+    full = lambda item: Context({'row': item}, base=ctx)
+    compact = lambda item: LoopScope('row', item, ctx)
+    report("Creating %d loop scopes" % rows, [
+        ('Context', measure(lambda: scopes(full))),
+        ('LoopScope', measure(lambda: scopes(compact))),
+    ])
+    for (label, make_scope) in [('Context', full), ('LoopScope', compact)]:
+        print("    %-30s %10.0f bytes per row" % (label, memory(make_scope) / rows))
+
+
+def _reset_one_by_one(ctx, dct):
+    # Resetting by deleting and setting the variables one by one (for comparison)
+    for name in list(ctx):
+        delattr(ctx, name)
+    for (name, val) in dct.items():
+        setattr(ctx, name, val)
+
+
+def bench_replace(size=2000, changed=20):
+    """
+        Switches an observed context with :param:`size` variables between
+        two views which differ in :param:`changed` variables.
+    """
+    first = {'v%d' % i: i if i % 2 else list(range(10)) for i in range(size)}
+    second = dict(first)
+    for i in range(changed):
+        second['v%d' % i] = -i
+    ctx = Context()
+    ctx.reset(first)
+    for i in range(0, size, 10):
+        node, _ = exp.parse('v%d' % i)
+        node.bind_ctx(ctx)
+    views = [ctx._snapshot()]
+    ctx.reset(second)
+    views.append(ctx._snapshot())
+
+    def run(switch):
+        for i in range(10):
+            switch(ctx, views[i % 2])
+
+    report("Switching between views of a %d variable context" % size, [
+        ('one by one', measure(lambda: run(_reset_one_by_one))),
+        ('replace', measure(lambda: run(Context._replace))),
+    ])
+
+
+def main():
+    bench_dependencies()
+    bench_nested_lookup()
+    bench_loop_scopes()
+    bench_replace()
+
+
+if __name__ == '__main__':
+    main()
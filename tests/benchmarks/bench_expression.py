@@ -0,0 +1,249 @@
+"""
+    Benchmarks for the expression module.
+"""
+import src.circular.template.expression as exp
+from src.circular.template.context import Context
+from src.circular.template.interpolatedstr import InterpolatedStr, StrTemplate
+from src.circular.utils.events import EventMixin
+
+from tests.benchmarks.utils import measure, report
+
+EXPRESSIONS = [
+    "a.b[i] + f(x)",
+    "[p+1 for p in lst if p%2 == 0]",
+    "depth*indent+'em'",
+    "root.child.child.child.leaf and True",
+    "func(ch, ev='some string with \\'escapes\\'') ** 2 // 3 != 4",
+    "item is not None and item.name in selected_names",
+]
+
+
+def bench_tokenize(copies=500):
+    exprs = EXPRESSIONS * copies
+
+    def run(tokenizer):
+        for expr in exprs:
+            for _tok in tokenizer(expr):
+                pass
+
+    report("Tokenizing %d expressions" % len(exprs), [
+        (name, measure(lambda tokenizer=tokenizer: run(tokenizer)))
+        for (name, tokenizer) in sorted(exp.TOKENIZERS.items())
+    ])
+
+
+def bench_compiled(iterations=20000):
+    ctx = Context()
+    ctx.a = Context({'b': list(range(10))})
+    ctx.i = 3
+    ctx.f = lambda x: x * 2
+    ctx.x = 21
+    ctx.lst = list(range(20))
+    for expr in ["a.b[i] + f(x)", "[p+1 for p in lst if p%2 == 0]"]:
+        ast, _ = exp.parse(expr)
+        compiled = ast.compile()
+
+        def run(evaluate):
+            for _ in range(iterations):
+                evaluate(ctx)
+
+        report("Evaluating %s %d times" % (expr, iterations), [
+            ('evalctx', measure(lambda: run(ast.evalctx))),
+            ('compiled', measure(lambda: run(compiled))),
+        ])
+
+
+def bench_evalmany(rows=100000):
+    ctx = Context()
+    ctx.limit = 500
+    items = list(range(rows))
+    ast, _ = exp.parse("item % 1000 == limit")
+
+    def per_item():
+        return [ast.evalctx(Context({'item': item}, base=ctx)) for item in items]
+
+    report("Filtering %d items" % rows, [
+        ('context per item', measure(per_item)),
+        ('evalmany', measure(lambda: ast.evalmany(ctx, 'item', items))),
+    ])
+
+
+def bench_vectorized(samples=50000):
+    ctx = Context()
+    ctx.scale = 1.5
+    ctx.threshold = 100
+    ctx.samples = [float(i % 997) for i in range(samples)]
+    ast, _ = exp.parse("[x*scale for x in samples if x > threshold]")
+
+    def run(min_size):
+        exp.set_vectorize_min_size(min_size)
+        try:
+            ast.evalctx(ctx)
+        finally:
+            exp.set_vectorize_min_size(1000)
+
+    report("Comprehension over %d samples" % samples, [
+        ('element by element', measure(lambda: run(None))),
+        ('vectorized', measure(lambda: run(1000))),
+    ])
+
+
+def bench_incremental(size=50000, appends=20):
+    ctx = Context()
+    ctx.lst = list(range(size))
+    ast, _ = exp.parse("[x*2 for x in lst if x % 3 == 0]")
+    ast.bind_ctx(ctx)
+    ast.eval()
+
+    def run(force_cache_refresh):
+        for i in range(appends):
+            ctx.lst.append(i)
+            ast.eval(force_cache_refresh=force_cache_refresh)
+
+    report("Appending %d items to a %d element list" % (appends, size), [
+        ('recompute', measure(lambda: run(True))),
+        ('incremental', measure(lambda: run(False))),
+    ])
+
+
+def bench_slice_edit(size=50000, edits=20, width=10):
+    ctx = Context()
+    ctx.lst = list(range(size))
+    ast, _ = exp.parse("[x*2 for x in lst if x % 3 == 0]")
+    ast.bind_ctx(ctx)
+    ast.eval()
+
+    def run(force_cache_refresh):
+        for i in range(edits):
+            ctx.lst[i*width:(i+1)*width] = range(width)
+            ast.eval(force_cache_refresh=force_cache_refresh)
+
+    report("Replacing %d slices of a %d element list" % (edits, size), [
+        ('recompute', measure(lambda: run(True))),
+        ('incremental', measure(lambda: run(False))),
+    ])
+
+
+def bench_bundle(copies=200):
+    exprs = [expr + ' + ' + str(i) for i in range(copies) for expr in EXPRESSIONS]
+    bundle = exp.build_bundle(expressions=exprs)
+
+    def parse_all():
+        for expr in exprs:
+            exp.parse(expr, use_cache=False)
+
+    def load_all():
+        exp.load_bundle(bundle)
+        parse_all()
+        exp.clear_bundle()
+
+    report("Cold start with %d expressions" % len(exprs), [
+        ('parse', measure(parse_all)),
+        ('bundle', measure(load_all)),
+    ])
+
+
+def bench_interpolated(sizes=(100, 200, 400, 800)):
+    """
+        Parsing time of a text node should grow linearly with the number
+        of placeholders it contains, i.e. the time per placeholder should
+        stay (roughly) constant.
+    """
+    segment = "Some literal text in between {{ item.name }} and {{ 'const' }} more; "
+    results = []
+    for size in sizes:
+        text = segment * (size // 2)
+        best = measure(lambda text=text: exp.parse_interpolated_str(text))
+        results.append(("%d placeholders (per placeholder)" % size, best / size))
+    report("Parsing large interpolated strings", results)
+
+
+def bench_propagation(depth=50, changes=2000):
+    """
+        Propagates change events up a chain of :param:`depth` emitters (the way
+        a change of a leaf propagates up an expression tree) using ordinary and
+        lean handlers, and through an actual expression tree of the same depth.
+    """
+    def chain(lean):
+        nodes = [EventMixin() for _ in range(depth)]
+        for (child, parent) in zip(nodes, nodes[1:]):
+            if lean:
+                child.bind('change', lambda data, parent=parent: parent.emit('change', data), lean=True)
+            else:
+                child.bind('change', lambda event, parent=parent: parent.emit('change', event.data))
+        nodes[-1].bind('change', lambda data: None, lean=True)
+        return nodes[0]
+
+    def run(leaf):
+        for _ in range(changes):
+            leaf.emit('change', {})
+
+    ctx = Context()
+    ctx.x = 0
+    ast, _ = exp.parse("+".join(["x"] * depth))
+    ast.bind_ctx(ctx)
+
+    def change_expression():
+        for i in range(changes):
+            ctx.x = i
+            ast.eval()
+
+    event_leaf, lean_leaf = chain(False), chain(True)
+    report("Propagating %d changes through %d levels" % (changes, depth), [
+        ('Event objects', measure(lambda: run(event_leaf))),
+        ('lean handlers', measure(lambda: run(lean_leaf))),
+        ('expression (change + eval)', measure(change_expression)),
+    ])
+
+
+def bench_interpolated_clone(clones=5000, changes=20000):
+    """
+        Compares cloning all the asts of an interpolated string (including the
+        literal segments and the ``str`` calls wrapping the expressions) with
+        cloning only the expressions of a shared :class:`StrTemplate`. Then
+        compares reevaluating all of the expressions after a change with
+        reevaluating only the changed ones.
+    """
+    text = "Row {{ row.id }}: {{ row.name }} ({{ row.price * 2 }} EUR) - {{ 'const' }} {{ status }}"
+    asts = exp.parse_interpolated_str(text)
+    template = StrTemplate(text)
+    report("Cloning an interpolated string %d times" % clones, [
+        ('all asts', measure(lambda: [[ast.clone() for ast in asts] for _ in range(clones)])),
+        ('template expressions', measure(lambda: [[ast.clone() for ast in template.exprs] for _ in range(clones)])),
+    ])
+
+    ctx = Context()
+    ctx.row = Context({'id': 1, 'name': 'name', 'price': 10})
+    ctx.status = ''
+    istr = InterpolatedStr(text)
+    istr.bind_ctx(ctx)
+
+    def run(evaluate_all):
+        for i in range(changes):
+            ctx.status = str(i)
+            if evaluate_all:
+                istr.evaluate()
+            else:
+                _ = istr.value
+
+    report("Updating an interpolated string %d times" % changes, [
+        ('evaluate all', measure(lambda: run(True))),
+        ('changed expressions', measure(lambda: run(False))),
+    ])
+
+
+def main():
+    bench_tokenize()
+    bench_compiled()
+    bench_evalmany()
+    bench_vectorized()
+    bench_incremental()
+    bench_slice_edit()
+    bench_bundle()
+    bench_interpolated()
+    bench_propagation()
+    bench_interpolated_clone()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+    Benchmarks for the observer module.
+"""
+import tracemalloc
+
+import src.circular.template.expression as exp
+import src.circular.template.observer as observer
+from src.circular.template.context import Context
+
+from tests.benchmarks.utils import measure, report
+
+
+class Model(object):
+    def __init__(self, val):
+        self.val = val
+
+
+def bench_observe(count=10000):
+    def observe_all(reuse_classes):
+        objs = [Model(i) for i in range(count)]
+        for obj in objs:
+            if not reuse_classes:
+                observer._OBSERVABLE_CLASSES.clear()
+            observer.observe(obj)
+        return objs
+
+    def allocated(reuse_classes):
+        tracemalloc.start()
+        objs = observe_all(reuse_classes)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objs
+        return size
+
+    report("Observing %d objects" % count, [
+        ('class per object', measure(lambda: observe_all(False))),
+        ('shared class', measure(lambda: observe_all(True))),
+    ])
+    print("    memory: class per object %.1f MB, shared class %.1f MB" % (
+        allocated(False) / 2**20, allocated(True) / 2**20))
+
+    def assign(objs):
+        for obj in objs:
+            obj.val += 1
+
+    per_object, shared = observe_all(False), observe_all(True)
+    report("Assigning to %d observed objects" % count, [
+        ('class per object', measure(lambda: assign(per_object))),
+        ('shared class', measure(lambda: assign(shared))),
+    ])
+
+
+def eager_proxy(val):
+    """ Recursively wraps the whole structure (as the proxies did before they became lazy) """
+    if isinstance(val, list):
+        ret = observer.ListProxy([])
+        list.extend(ret, [eager_proxy(item) for item in val])
+        ret._lazy = False
+        return ret
+    elif isinstance(val, dict):
+        ret = observer.DictProxy({})
+        dict.update(ret, {key: eager_proxy(item) for (key, item) in val.items()})
+        ret._lazy = False
+        return ret
+    return val
+
+
+def bench_proxy(records=20000):
+    response = {
+        'count': records,
+        'results': [
+            {'id': i, 'name': 'Item %d' % i, 'tags': ['a', 'b', 'c'], 'meta': {'score': i * 0.5, 'ok': True}}
+            for i in range(records)
+        ]
+    }
+    ctx = Context()
+
+    def assign_lazy():
+        ctx.response = response
+        return ctx.response['results'][0]['name']
+
+    def assign_eager():
+        ctx._dct['response'] = eager_proxy(response)
+        return ctx.response['results'][0]['name']
+
+    report("Assigning a response with %d records to a context" % records, [
+        ('eager proxies', measure(assign_eager)),
+        ('lazy proxies', measure(assign_lazy)),
+    ])
+
+
+def bench_batch(rows=1000, nodes=200):
+    ctx = Context()
+    ctx.rows = []
+    asts = []
+    for _ in range(nodes):
+        ast, _ = exp.parse("len(rows)")
+        ast.bind_ctx(ctx)
+        ast.eval()
+        asts.append(ast)
+
+    def append_rows():
+        for i in range(rows):
+            ctx.rows.append(i)
+        for ast in asts:
+            ast.eval()
+        del ctx.rows[:]
+
+    def append_rows_batched():
+        with observer.batch():
+            for i in range(rows):
+                ctx.rows.append(i)
+        for ast in asts:
+            ast.eval()
+        del ctx.rows[:]
+
+    report("Appending %d rows observed by %d expressions" % (rows, nodes), [
+        ('event per change', measure(append_rows)),
+        ('batch', measure(append_rows_batched)),
+    ])
+
+
+def bench_unobserved(rows=100000):
+    def load(lst):
+        for i in range(rows):
+            lst.append(i)
+        for i in range(rows):
+            lst[i] = -i
+
+    def observed_list():
+        lst = observer.ListProxy([])
+        observer.observe(lst)
+        load(lst)
+
+    report("Loading %d rows" % rows, [
+        ('plain list', measure(lambda: load([]))),
+        ('observed, no listeners', measure(observed_list)),
+    ])
+
+
+def bench_stream(size=100000, chunk=100, chunks=100):
+    def stream(series):
+        ctx = Context()
+        ctx.series = series
+        ast, _ = exp.parse("[x * 2 for x in series if x > 0]")
+        ast.bind_ctx(ctx)
+        ast.eval()
+        for i in range(chunks):
+            new_values = [float(i * chunk + j) for j in range(chunk)]
+            with observer.batch():
+                for val in new_values:
+                    ctx.series.append(val)
+                for _ in new_values:
+                    ctx.series.pop(0)
+            ast.eval()
+
+    def shift(series):
+        ctx = Context()
+        ctx.series = series
+        ast, _ = exp.parse("[x * 2 for x in series if x > 0]")
+        ast.bind_ctx(ctx)
+        ast.eval()
+        for i in range(chunks):
+            ctx.series.shift(float(i * chunk + j) for j in range(chunk))
+            ast.eval()
+
+    def allocated(factory):
+        tracemalloc.start()
+        series = factory()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del series
+        return size
+
+    values = [float(i) for i in range(size)]
+    report("Streaming %d chunks of %d values into a %d item series" % (chunks, chunk, size), [
+        ('ListProxy', measure(lambda: stream(observer.ListProxy(values)))),
+        ('ArrayProxy', measure(lambda: shift(observer.ArrayProxy('d', values)))),
+    ])
+    print("    memory: ListProxy %.1f MB, ArrayProxy %.1f MB" % (
+        allocated(lambda: observer.ListProxy([float(i) for i in range(size)])) / 2**20,
+        allocated(lambda: observer.ArrayProxy('d', (float(i) for i in range(size)))) / 2**20))
+
+
+def main():
+    bench_observe()
+    bench_proxy()
+    bench_batch()
+    bench_unobserved()
+    bench_stream()
+
+
+if __name__ == '__main__':
+    main()
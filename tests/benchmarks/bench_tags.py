@@ -0,0 +1,81 @@
+"""
+    Benchmarks for the template tag plugins.
+"""
+import gc
+import tracemalloc
+
+from tests.brython.browser.html import MockElement
+
+from src.circular.template.context import Context
+from src.circular.template.tags import For
+
+from tests.benchmarks.utils import measure, report
+
+
+def bench_for_reorder(rows=10000):
+    tr_elem = MockElement('tr')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ row }}"
+    tr_elem <= text_elem
+    plug = For(tr_elem, loop_spec="row in rows")
+    ctx = Context()
+    ctx.rows = list(range(rows))
+    plug.bind_ctx(ctx)
+
+    def rerender():
+        ctx.rows.reverse()
+        plug.bind_ctx(ctx)
+
+    def reorder():
+        ctx.rows.reverse()
+        plug.update()
+
+    report("Reversing a %d row table" % rows, [
+        ('re-render', measure(rerender)),
+        ('reorder elements', measure(reorder)),
+    ])
+
+
+class Row(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def bench_rerender_leak(rows=20, renders=(1000, 2000, 3000)):
+    """
+        Re-renders a list bound to a long-lived data model many times. The memory
+        used (and the number of listeners attached to the model) should not grow
+        with the number of renders.
+    """
+    tr_elem = MockElement('tr')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ row.name }} {{ rows[0].name }}"
+    tr_elem <= text_elem
+    plug = For(tr_elem, loop_spec="row in rows")
+    ctx = Context()
+    ctx.rows = [Row(str(i)) for i in range(rows)]
+
+    def listeners():
+        model = [ctx.rows] + list(ctx.rows)
+        return sum(len(obj._obs____._event_handlers.get('change', [])) for obj in model if hasattr(obj, '_obs____'))
+
+    print("Re-rendering a %d row list" % rows)
+    tracemalloc.start()
+    done = 0
+    for count in renders:
+        while done < count:
+            plug.bind_ctx(ctx)
+            done += 1
+        gc.collect()
+        print("    %-6d renders %10.1f kB, %d listeners on the model" % (
+            count, tracemalloc.get_traced_memory()[0] / 2**10, listeners()))
+    tracemalloc.stop()
+
+
+def main():
+    bench_for_reorder()
+    bench_rerender_leak()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+    Helpers shared by the benchmark scripts. The benchmarks are plain
+    scripts (they are not collected by py.test) and are run from the
+    project root, e.g.:
+
+    ```
+        PYTHONPATH=./src/:./tests/brython/ python -m tests.benchmarks.bench_expression
+    ```
+
+    or using ``fab test.bench:expression``.
+"""
+import timeit
+
+
+def measure(func, number=1, repeat=3):
+    """
+        Runs :param:`func` :param:`number` times, repeating the measurement
+        :param:`repeat` times, and returns the best time per call in seconds.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(title, results):
+    """
+        Prints the timings in :param:`results` (a list of ``(label, seconds)`` pairs)
+        together with their ratio to the first one.
+    """
+    print(title)
+    base = results[0][1]
+    for (label, secs) in results:
+        print("    %-30s %10.3f ms  (x%.2f)" % (label, secs * 1000, base / secs if secs else 0))
@@ -0,0 +1,56 @@
+from array import array
+
+from pytest import importorskip
+
+from src.circular.platform.linux import vectorize
+
+importorskip('numpy')
+
+
+def test_eval_comprehension():
+    var = ('var',)
+    double = ('op', '*', var, ('const', 2))
+    even = ('op', '==', ('op', '%', var, ('const', 2)), ('const', 0))
+    assert vectorize.eval_comprehension(double, None, [1, 2, 3]) == [2, 4, 6]
+    assert vectorize.eval_comprehension(double, even, [1, 2, 3, 4]) == [4, 8]
+    assert vectorize.eval_comprehension(('neg', var), None, [1.5, -2.0]) == [-1.5, 2.0]
+    assert vectorize.eval_comprehension(('const', 1), None, [5, 6]) == [1, 1]
+    assert vectorize.eval_comprehension(('op', '+', even, ('const', 1)), None, [1, 2]) == [1, 2]
+    assert vectorize.eval_comprehension(('op', '//', var, ('const', -2)), None, [-3, 3, 5]) == [-3 // -2, 3 // -2, 5 // -2]
+
+    result = vectorize.eval_comprehension(('op', '/', var, ('const', 3)), None, [1, 2])
+    assert result == [1 / 3, 2 / 3]
+    assert all(type(val) is float for val in result)
+    result = vectorize.eval_comprehension(double, None, [1, 2])
+    assert all(type(val) is int for val in result)
+
+
+def test_unsupported():
+    var = ('var',)
+    # Mixed or non-numeric items
+    assert vectorize.eval_comprehension(var, None, [1, 2.0]) is None
+    assert vectorize.eval_comprehension(var, None, [True, False]) is None
+    assert vectorize.eval_comprehension(var, None, ['a']) is None
+    # Division by zero
+    assert vectorize.eval_comprehension(('op', '/', ('const', 1), var), None, [1, 0]) is None
+    assert vectorize.eval_comprehension(('op', '%', ('const', 1), var), None, [1, 0]) is None
+    # Possible integer overflow
+    assert vectorize.eval_comprehension(('op', '*', var, var), None, [2**40]) is None
+    assert vectorize.eval_comprehension(var, None, [2**60]) is None
+    assert vectorize.eval_comprehension(('op', '**', var, ('const', 2)), None, [3]) is None
+    assert vectorize.eval_comprehension(('op', '**', var, ('const', 2)), None, [3.0]) == [9.0]
+
+
+def test_mask():
+    var = ('var',)
+    even = ('op', '==', ('op', '%', var, ('const', 2)), ('const', 0))
+    assert vectorize.eval_comprehension(var, even, [1, 2, 4], with_mask=True) == ([2, 4], [False, True, True])
+    assert vectorize.eval_comprehension(var, None, [1, 2], with_mask=True) == ([1, 2], [True, True])
+
+
+def test_array_items():
+    var = ('var',)
+    double = ('op', '*', var, ('const', 2))
+    assert vectorize.eval_comprehension(double, None, array('i', [1, 2])) == [2, 4]
+    assert vectorize.eval_comprehension(double, None, array('f', [0.5])) == [1.0]
+    assert vectorize.eval_comprehension(var, None, array('q', [2**60])) is None
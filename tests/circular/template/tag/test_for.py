@@ -1,8 +1,14 @@
+import gc
+from unittest.mock import patch
+
 from tests.brython.browser.html import MockElement, MockAttr
 
 from src.circular.template.context import Context
+from src.circular.template import expression
 from src.circular.template.tags import For
+from src.circular.template.tags.textplugin import TextPlugin
 from src.circular.template.tpl import _compile
+from src.circular.template.observer import ArrayProxy
 
 def filter_comments(lst):
     return [ e for e in lst if e.tagName != 'comment' ]
@@ -57,3 +63,151 @@ def test_nested_for():
     red_elem = doc._findChild('id-Red')
     assert red_elem.children[0].text == 'RedTest'
 
+
+def test_for_compiled_condition():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }}"
+    div_elem <= text_elem
+    try:
+        expression.set_evaluation_mode(expression.EVAL_COMPILED)
+        plug = For(div_elem, loop_spec="num in nums if num % 2 == 0")
+        ctx = Context({'nums': [1, 2, 3, 4]})
+        elems = filter_comments(plug.bind_ctx(ctx))
+    finally:
+        expression.set_evaluation_mode(expression.EVAL_INTERPRETED)
+    assert [elem.children[0].text for elem in elems] == ['2', '4']
+
+
+def test_for_failing_condition():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="num in nums if 12 // num == 6")
+    ctx = Context({'nums': [0, 2, 3]})
+    elems = filter_comments(plug.bind_ctx(ctx))
+    assert [elem.children[0].text for elem in elems] == ['2']
+
+
+def test_for_generator():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="num in nums if num != 2")
+    ctx = Context({'nums': (num for num in range(5))})
+    elems = filter_comments(plug.bind_ctx(ctx))
+    assert [elem.children[0].text for elem in elems] == ['0', '1', '3', '4']
+
+
+def test_for_failing_render():
+    orig_bind_ctx = TextPlugin.bind_ctx
+
+    def bind_ctx(self, ctx):
+        if ctx._get('c')['name'] == 'Broken':
+            raise ValueError("Broken")
+        return orig_bind_ctx(self, ctx)
+
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ c['name'] }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="c in colours")
+    ctx = Context({'colours': [{'name': 'Red'}, {'name': 'Broken'}, {'name': 'Blue'}]})
+    with patch.object(TextPlugin, 'bind_ctx', bind_ctx):
+        elems = filter_comments(plug.bind_ctx(ctx))
+    assert [elem.children[0].text for elem in elems] == ['Red', 'Blue']
+
+
+def test_for_reorder():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="num in nums if num != 2")
+    ctx = Context()
+    ctx.nums = [3, 1, 2, 4]
+    elems = filter_comments(plug.bind_ctx(ctx))
+    by_num = {elem.children[0].text: elem for elem in elems}
+
+    # Reordering the list reorders the already rendered elements
+    ctx.nums.sort()
+    assert plug._dirty_self is True
+    elems = filter_comments(plug.update())
+    assert elems == [by_num['1'], by_num['3'], by_num['4']]
+    ctx.nums.reverse()
+    elems = filter_comments(plug.update())
+    assert elems == [by_num['4'], by_num['3'], by_num['1']]
+
+    # Other changes cause the elements to be re-rendered
+    ctx.nums.append(5)
+    elems = filter_comments(plug.update())
+    assert [elem.children[0].text for elem in elems] == ['4', '3', '1', '5']
+    assert by_num['4'] not in elems
+
+
+def test_for_range():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="num in nums if num != 2")
+    ctx = Context()
+    ctx.nums = ArrayProxy('i', [1, 2, 3, 4])
+    elems = filter_comments(plug.bind_ctx(ctx))
+    by_num = {elem.children[0].text: elem for elem in elems}
+
+    # Only the elements for the new items are rendered
+    ctx.nums.shift([2, 5])
+    elems = filter_comments(plug.update())
+    assert [elem.children[0].text for elem in elems] == ['3', '4', '5']
+    assert elems[:2] == [by_num['3'], by_num['4']]
+    ctx.nums[0] = 6
+    ctx.nums.reverse()
+    elems = filter_comments(plug.update())
+    assert [elem.children[0].text for elem in elems] == ['5', '4', '6']
+    assert elems[1] is by_num['4']
+
+
+def test_for_rerender_releases_children():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ num }} {{ nums[0] }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="num in nums")
+    ctx = Context()
+    ctx.nums = [1, 2, 3]
+
+    def listeners():
+        return len(ctx.nums._obs____._event_handlers.get('change', []))
+
+    plug.bind_ctx(ctx)
+    gc.collect()
+    count = listeners()
+    for _ in range(10):
+        plug.bind_ctx(ctx)
+    gc.collect()
+    assert listeners() == count
+
+
+def test_for_slice_assignment():
+    div_elem = MockElement('div')
+    text_elem = MockElement('#text')
+    text_elem.text = "{{ c['name'] }}"
+    div_elem <= text_elem
+    plug = For(div_elem, loop_spec="c in colours")
+    ctx = Context()
+    ctx.colours = [{'name': 'Red'}, {'name': 'Blue'}]
+    elems = filter_comments(plug.bind_ctx(ctx))
+    blue = elems[1]
+
+    # Only the row for the replaced item is re-rendered and it observes the stored item
+    ctx.colours[0:1] = [{'name': 'Green'}]
+    elems = filter_comments(plug.update())
+    assert [elem.children[0].text for elem in elems] == ['Green', 'Blue']
+    assert elems[1] is blue
+    ctx.colours[0]['name'] = 'Yellow'
+    assert plug._dirty_subtree is True
+    plug.update()
+    assert elems[0].children[0].text == 'Yellow'
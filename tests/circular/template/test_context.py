@@ -1,7 +1,10 @@
 import asyncio
+import gc
 import pytest
 
-from src.circular.template.context import Context
+from src.circular.template.context import Context, LoopScope
+from src.circular.template.expression import parse
+from src.circular.template.observer import batch, observe
 
 
 def test_extension():
@@ -28,6 +31,140 @@ def test_extension():
     assert second_child.a == 20
 
 
+def test_nested_lookup():
+    root = Context()
+    root.a = 10
+    middle = Context(base=root)
+    leaf = Context(base=Context(base=middle))
+
+    assert leaf._get('a') == 10
+
+    # Assigning to the variable is seen by the nested contexts
+    root.a = 20
+    assert leaf._get('a') == 20
+
+    # So is shadowing it in a closer scope
+    middle.a = 30
+    assert leaf._get('a') == 30
+    middle._set('a', 40)
+    assert leaf._get('a') == 40
+
+    # And removing the shadowing variable
+    del middle.a
+    assert leaf._get('a') == 20
+    root._clear()
+    with pytest.raises(KeyError):
+        leaf._get('a')
+
+    # Variables of a dict base
+    leaf = Context(base=Context(base={'b': 1}))
+    assert leaf._get('b') == 1
+    with pytest.raises(KeyError):
+        leaf._get('c')
+
+
+def test_loop_scope():
+    base = Context()
+    base.a = 1
+    scope = LoopScope('x', 10, base)
+    assert not hasattr(scope, '__dict__')
+    assert scope._get('x') == 10
+    assert scope._get('a') == 1
+    assert scope.x == 10
+    assert scope.a == 1
+    assert 'x' in scope and 'a' in scope and 'b' not in scope
+    assert list(scope) == ['x']
+
+    nested = Context(base=scope)
+    ast, _ = parse('x + a')
+    ast.bind_ctx(scope)
+    assert ast.eval() == 11
+    assert nested._get('x') == 10
+
+    # Assigning to the scope converts it to a full context
+    scope.x = 20
+    assert ast.eval() == 21
+    assert nested._get('x') == 20
+    scope.b = 3
+    assert nested._get('b') == 3
+    assert list(scope) == ['x', 'b']
+
+    # Scopes can be observed
+    scope = LoopScope('x', 10, base)
+    events = []
+    observe(scope).bind('change', lambda event: events.append(event.data['value']))
+    scope.x = 30
+    assert events == [30]
+    assert scope._get('x') == 30
+
+
+def test_nested_loop_scopes():
+    base = Context()
+    base.a = 1
+    row = LoopScope('row', 'r', base)
+    cells = [LoopScope('cell', i, row) for i in range(3)]
+    assert [cell._get('a') for cell in cells] == [1, 1, 1]
+    assert cells[0]._get('row') == 'r'
+
+    # The lookups from the cells are cached in the (shared) scope of the row
+    assert row._scope_cache['a'][1] is base._locals()
+    assert all(cell._scope_cache is None for cell in cells)
+
+    base.a = 2
+    assert cells[1]._get('a') == 2
+    row.a = 3
+    assert [cell._get('a') for cell in cells] == [3, 3, 3]
+    del row.a
+    assert cells[2]._get('a') == 2
+
+
+def test_snapshot():
+    ctx = Context()
+    ctx.a = 1
+    ctx.lst = [1, 2]
+    ctx.b = 2
+    nested = Context(base=ctx)
+    assert nested._get('a') == 1
+
+    saved = ctx._snapshot()
+    lst = ctx.lst
+    ctx.a = 10
+    del ctx.b
+    ctx.c = 3
+    assert dict(saved) == {'a': 1, 'lst': [1, 2], 'b': 2}
+    assert nested._get('a') == 10
+    with pytest.raises(TypeError):
+        saved['a'] = 2
+
+    events = []
+    observe(ctx).bind('change', lambda event: events.append(event.data))
+    ctx._replace(saved)
+    assert dict(ctx._snapshot()) == {'a': 1, 'lst': [1, 2], 'b': 2}
+    assert nested._get('a') == 1
+    assert nested._get('b') == 2
+
+    # A single change event for the variables which changed, lists are not copied
+    assert len(events) == 1
+    assert sorted((change['type'], change['key']) for change in events[0]['events']) == [
+        ('__delattr__', 'c'),
+        ('__setattr__', 'a'),
+        ('__setattr__', 'b'),
+    ]
+    assert ctx.lst is lst
+
+    # Replacing by equal values does not change anything
+    ctx.reset({'a': 1, 'lst': [1, 2], 'b': 2})
+    assert len(events) == 1
+    assert ctx.lst is lst
+
+    # Equal values of a different type are a change
+    ctx.reset({'a': True, 'lst': [1, 2], 'b': 2.0})
+    assert len(events) == 2
+    assert sorted(change['key'] for change in events[1]['events']) == ['a', 'b']
+    assert ctx.a is True
+    assert isinstance(ctx.b, float)
+
+
 def test_future(event_loop):
     asyncio.set_event_loop(event_loop)
     ctx = Context()
@@ -37,3 +174,98 @@ def test_future(event_loop):
     event_loop.run_until_complete(fut)
     assert ctx.test == 3
 
+
+
+def test_replace_future(event_loop):
+    asyncio.set_event_loop(event_loop)
+    ctx = Context()
+    ctx.a = 1
+    ctx.b = 2
+    fut = asyncio.async(asyncio.sleep(0.1, result=3))
+    ctx._replace({'a': fut, 'b': 2})
+    assert hasattr(ctx, 'a') is False
+    event_loop.run_until_complete(fut)
+    assert ctx.a == 3
+    assert ctx.b == 2
+
+
+def test_load(event_loop):
+    asyncio.set_event_loop(event_loop)
+    ctx = Context()
+    events = []
+    observe(ctx).bind('change', lambda event: events.append(event.data))
+    done = ctx._load({
+        'a': asyncio.sleep(0.01, result=1),
+        'b': asyncio.sleep(0.02, result=[2]),
+        'c': 3,
+        'slow': asyncio.sleep(10, result=4),
+    }, timeout={'slow': 0.05}, placeholders={'b': [], 'slow': 'loading'})
+
+    # The placeholders are set immediately
+    assert ctx.b == [] and ctx.slow == 'loading'
+    assert 'a' not in ctx and 'c' not in ctx
+    assert len(events) == 1
+
+    errors = event_loop.run_until_complete(done)
+    assert (ctx.a, ctx.b, ctx.c) == (1, [2], 3)
+    assert ctx.slow == 'loading'
+    assert list(errors.keys()) == ['slow']
+    assert isinstance(errors['slow'], asyncio.TimeoutError)
+
+    # The results are set by a single change
+    assert len(events) == 2
+    assert events[1]['type'] == 'batch'
+    assert [change['key'] for change in events[1]['events']] == ['a', 'b', 'c']
+
+    # A common timeout
+    ctx = Context()
+    done = ctx._load({'a': asyncio.sleep(10, result=1), 'b': asyncio.sleep(0, result=2)}, timeout=0.01)
+    errors = event_loop.run_until_complete(done)
+    assert list(errors.keys()) == ['a']
+    assert 'a' not in ctx and ctx.b == 2
+
+
+def test_watch():
+    ctx = Context()
+    events = []
+
+    def handler(event):
+        events.append((event.data['key'], event.data.get('value')))
+
+    ctx._watch('a', handler)
+    ctx.a = 10
+    ctx.b = 20
+    del ctx.a
+    assert events == [('a', 10), ('a', None)]
+
+    ctx._unwatch('a', handler)
+    ctx._unwatch('a', handler)
+    ctx.a = 30
+    assert len(events) == 2
+
+
+def test_discarded_expressions():
+    ctx = Context()
+    ctx.lst = [1, 2]
+    for _ in range(10):
+        ast, _ = parse('[x for x in lst if x > 0] + [len(lst)]')
+        ast.bind_ctx(ctx)
+        ast.eval()
+    del ast
+    gc.collect()
+    # Expressions which are gone do not stay bound to the context or the data
+    assert ctx._watchers == {}
+    assert not ctx.lst._obs____.has_listeners('change')
+
+
+def test_watch_batch():
+    ctx = Context()
+    events = []
+    ctx._watch('a', lambda event: events.append(event.data['value']))
+    ctx._watch('b', lambda event: events.append(event.data['value']))
+    with batch():
+        ctx.a = 1
+        ctx.c = 2
+        ctx.a = 3
+        ctx.b = 4
+    assert events == [3, 4]
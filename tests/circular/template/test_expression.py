@@ -4,6 +4,7 @@ from tests.utils import TObserver
 
 import src.circular.template.expression as exp
 from src.circular.template.context import Context
+from src.circular.template.observer import batch, ArrayProxy
 
 
 def test_parse_number():
@@ -80,6 +81,29 @@ def test_tokenize():
     ]
 
 
+def test_tokenizer_engines():
+    exprs = [
+        "a - b",
+        "'123'+123.5==[ahoj]",
+        "a is   not b",
+        "a is not_b and order or isnot",
+        "[p+1 for p in lst if p%2==0]",
+        "func(ch,ev=s) ** 2 // 3 != 4 >= x <= y",
+        "'esc\\\\aped \\n \\'str\\''+\"dbl\"",
+        "obj.d[0].a[1:-1:2] in {1.2.3}",
+        "a <",
+    ]
+    for expr in exprs:
+        assert list(exp.tokenize_regex(expr)) == list(exp.tokenize_legacy(expr))
+    try:
+        exp.set_tokenizer('legacy')
+        assert exp.tokenize("a or b").__name__ == 'tokenize_legacy'
+    finally:
+        exp.set_tokenizer('regex')
+    with raises(Exception):
+        list(exp.tokenize_regex("'unterminated"))
+
+
 def parse_mock(token_stream, end_tokens=[]):
     if len(token_stream) == 0:
         raise Exception("End of stream")
@@ -214,6 +238,21 @@ def test_parse_interpolated_string():
     val = "".join([ast.evalctx(ctx) for ast in asts])
     assert val == 'Test text {{{{}}{}{}}} other }}'
 
+    # Empty expressions
+    asts = exp.parse_interpolated_str('a {{ }} b')
+    val = "".join([ast.evalctx(ctx) for ast in asts])
+    assert val == 'a None b'
+
+    # Large text nodes
+    asts = exp.parse_interpolated_str('{{ name }}, {{ 2*3 }};' * 300)
+    assert len(asts) == 600
+    val = "".join([ast.evalctx(ctx) for ast in asts])
+    assert val == 'Name, 6;' * 300
+
+    # Tokenizing from an offset yields absolute positions
+    for tokenizer in exp.TOKENIZERS.values():
+        assert list(tokenizer('{{ a }}', 2)) == [(exp.T_IDENTIFIER, 'a', 4), (exp.T_RBRACE, '}', 6), (exp.T_RBRACE, '}', 7)]
+
 
 def test_parse():
     ctx = Context()
@@ -350,6 +389,217 @@ def test_parse():
         assert ast.evalctx(ctx) == [-1, -5]
 
 
+def test_compile():
+    ctx = Context()
+    ctx.s = "abcde"
+    ctx.a = 3
+    ctx.lst = [1, 2, 3, 4]
+    ctx.func = lambda x, ev='': str(x+10)+ev
+    ctx.obj = Context()
+    ctx.obj.b = Context()
+    ctx.obj.b.c = 20
+    ctx.obj.d = [Context({'a': 30})]
+    exprs = [
+        '(1+1*8)*9',
+        '-a + 2**a // 2 % 3',
+        'True and not False or None',
+        'a is not None and a in lst',
+        's[-1] + s[1:3] + s[0:-1:2] + s[:-1]',
+        '[p+1 for p in lst if p%2==0]',
+        '[[q*p for q in lst] for p in lst if p == a]',
+        '[a for a in lst if a % 2 == 0] + [a]',
+        'str(10) + str(len([1,2,3])) + str(int("21"))',
+        'obj.b.c + obj.d[0].a',
+        'func(a, ev=s) + "a,b,c".split(",")[1]',
+        '[]',
+    ]
+    for expr in exprs:
+        ast, _ = exp.parse(expr)
+        assert ast.compile()(ctx) == ast.evalctx(ctx)
+        assert ast.compile() is ast.compile()
+
+    ast, _ = exp.parse('undefined + 1')
+    with raises(KeyError):
+        ast.compile()(ctx)
+
+    ctx.b = 5
+    ast, _ = exp.parse('a + b')
+    assert exp.ctx_evaluator(ast) == ast.evalctx
+    try:
+        exp.set_evaluation_mode(exp.EVAL_COMPILED)
+        assert exp.ctx_evaluator(ast)(ctx) == 8
+    finally:
+        exp.set_evaluation_mode(exp.EVAL_INTERPRETED)
+
+
+def test_evalmany():
+    ctx = Context()
+    ctx.a = 10
+    ctx.x = 'outer'
+    ast, _ = exp.parse('x * 2 + a')
+    assert ast.evalmany(ctx, 'x', [1, 2, 3]) == [12, 14, 16]
+    assert ctx.x == 'outer'
+
+    ast, _ = exp.parse('[x*y for y in lst]')
+    ctx.lst = []
+    assert ast.evalmany(ctx, 'x', [1, 2]) == [[], []]
+    ctx.lst = [1, 2]
+    assert ast.evalmany(ctx, 'x', [1, 2]) == [[1, 2], [2, 4]]
+
+    ctx.gen = lambda n: (x for x in range(n))
+    ast, _ = exp.parse('[x*2 for x in gen(5) if x == 2]')
+    assert ast.evalctx(ctx) == [4]
+
+    ast, _ = exp.parse('12 // x')
+    with raises(ZeroDivisionError):
+        ast.evalmany(ctx, 'x', [1, 0])
+    errors = []
+
+    def on_error(exc, item):
+        errors.append((type(exc), item))
+        return None
+
+    assert ast.evalmany(ctx, 'x', [1, 0, 3], on_error=on_error) == [12, None, 4]
+    assert errors == [(ZeroDivisionError, 0)]
+
+    try:
+        exp.set_evaluation_mode(exp.EVAL_COMPILED)
+        assert ast.evalmany(ctx, 'x', [1, 2]) == [12, 6]
+    finally:
+        exp.set_evaluation_mode(exp.EVAL_INTERPRETED)
+
+
+def test_vectorized():
+    ctx = Context()
+    ctx.scale = 3
+    ctx.threshold = 2.5
+    ctx.samples = list(range(-5, 20))
+    ctx.names = ['a', 'b', 'c']
+    exprs = [
+        '[x*scale for x in samples if x > threshold]',
+        '[-x // 2 + 1 for x in samples if x % 3 == 0]',
+        '[x / scale for x in samples]',
+        '[x for x in samples if x <= scale and x != 0]',
+        '[x + "!" for x in names]',
+    ]
+    for expr in exprs:
+        ast, _ = exp.parse(expr)
+        try:
+            exp.set_vectorize_min_size(None)
+            expected = ast.evalctx(ctx)
+            exp.set_vectorize_min_size(1)
+            assert ast.evalctx(ctx) == expected
+            ast.bind_ctx(ctx)
+            assert ast.eval(force_cache_refresh=True) == expected
+        finally:
+            exp.set_vectorize_min_size(1000)
+
+    ast, _ = exp.parse('[x*scale for x in samples if x > threshold]')
+    ast.bind_ctx(ctx)
+    assert ast._expr._vector_program('x', ctx) == ('op', '*', ('var',), ('const', 3))
+    assert ast._cond._vector_program('x', ctx) == ('op', '>', ('var',), ('const', 2.5))
+    ast, _ = exp.parse('[x for x in samples if x <= scale and x != 0]')
+    assert ast._cond._vector_program('x', ctx) is None
+
+
+def test_parse_cache():
+    exp._PARSE_CACHE.clear(reset_stats=True)
+    old_size = exp.parse_cache_stats()['maxsize']
+    try:
+        exp.set_parse_cache_size(2)
+        exp.parse('a+b')
+        exp.parse('a+b')
+        assert exp.parse_cache_stats()['hits'] == 1
+
+        # The cache key must respect trailing_garbage_ok
+        exp.parse('a+b', trailing_garbage_ok=True)
+        exp.parse('a+b', trailing_garbage_ok=True)
+        stats = exp.parse_cache_stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 2
+
+        exp.parse('c+d')
+        stats = exp.parse_cache_stats()
+        assert stats['evictions'] == 1
+        assert stats['size'] == 2
+
+        exp.parse('c+d', use_cache=False)
+        assert exp.parse_cache_stats()['hits'] == 2
+    finally:
+        exp.set_parse_cache_size(old_size)
+
+
+def test_dump_load():
+    ctx = Context()
+    ctx.lst = [1, 2, 3, 4]
+    ctx.obj = Context({'a': 5})
+    ctx.f = lambda x, y=1: x * y
+    for expr in ['[p+1 for p in lst if p%2==0]', 'obj.a - -1', 'f(obj.a, y=2) + lst[1:3][0]', '[None, "s", 1.5]']:
+        ast, _ = exp.parse(expr, use_cache=False)
+        loaded = exp.load_ast(ast.dump())
+        assert repr(loaded) == repr(ast)
+        assert loaded.evalctx(ctx) == ast.evalctx(ctx)
+
+
+def test_bundle():
+    exp._PARSE_CACHE.clear()
+    bundle = exp.build_bundle(expressions=['a+b', ('c if x', True)], interpolated_strs=['Hi {{ name }}!'])
+    try:
+        exp.load_bundle(bundle)
+        with patch('src.circular.template.expression.tokenize', side_effect=Exception("Should not tokenize")):
+            ast, pos = exp.parse('a+b')
+            assert repr(ast) == 'a + b'
+            ast, pos = exp.parse('c if x', trailing_garbage_ok=True)
+            assert repr(ast) == 'c'
+            assert pos == 1
+            asts = exp.parse_interpolated_str('Hi {{ name }}!')
+            assert "".join([ast.evalctx(Context({'name': 'John'})) for ast in asts]) == 'Hi John!'
+    finally:
+        exp.clear_bundle()
+        exp._PARSE_CACHE.clear()
+
+    # Bundles from other versions are ignored
+    exp.load_bundle({'version': -1, 'entries': bundle['entries']})
+    assert exp._BUNDLE == {}
+
+
+def test_simplify():
+    ctx = Context()
+    ctx.x = 2
+    ast, _ = exp.parse('2*3+x')
+    assert repr(ast) == '6 + x'
+    assert ast.evalctx(ctx) == 8
+
+    ast, _ = exp.parse('"ahoj"[1:] + str(1+1)')
+    assert repr(ast) == "'hoj' + str(2)"
+
+    ast, _ = exp.parse('True and x')
+    assert repr(ast) == 'x'
+    ast, _ = exp.parse('False and x')
+    assert ast.is_constant() and ast.evalctx(ctx) is False
+    ast, _ = exp.parse('0 or x')
+    assert repr(ast) == 'x'
+
+    # Failing constant expressions are kept so that they fail at runtime
+    ast, _ = exp.parse('1/0')
+    assert not ast.is_constant()
+
+    # Simplified subtrees still propagate changes
+    ast, _ = exp.parse('[p*(1+1) for p in lst if True and p % 2 == 0]')
+    ctx.lst = [1, 2, 3]
+    ast.bind_ctx(ctx)
+    t = TObserver(ast)
+    assert ast.value == [4]
+    ctx.lst.append(2)
+    assert len(t.events) == 1
+    assert ast.value == [4, 4]
+
+    asts = exp.parse_interpolated_str('{{ 1+3 }} and {{ "a" }} is {{ x }}{{ None }}.')
+    assert len(asts) == 3
+    assert repr(asts[0]) == repr('4 and a is ')
+    assert repr(asts[2]) == repr('None.')
+
+
 def test_is_func():
     ast, _ = exp.parse('(1+1*x)*9')
     assert ast.is_function_call() is False
@@ -622,3 +872,156 @@ class TestExpressionChanges(object):
         self.exec_test(4)
         self.ctx.lst.pop()
         self.exec_test(4)
+
+    def test_short_circuit(self):
+        calls = []
+
+        def expensive(lst):
+            calls.append(lst)
+            return len(lst)
+
+        self.ctx.expensive = expensive
+        self.ctx.items = []
+        self.prepare("items and expensive(items)")
+        assert self.obs.value == []
+        assert calls == []
+
+        # The right argument is not subscribed while it does not affect the result
+        self.ctx.expensive = lambda lst: -1
+        assert len(self.t.events) == 0
+
+        self.ctx.items = [1, 2]
+        self.exec_test(-1)
+        self.ctx.expensive = expensive
+        self.exec_test(2)
+        assert calls == [[1, 2]]
+
+        self.prepare("x or undefined")
+        self.ctx.x = 10
+        self.exec_test(10)
+        self.ctx.x = 0
+        self.exec_test(None)
+
+        ast, _ = exp.parse("x or undefined")
+        assert ast.evalctx(Context({'x': 1})) == 1
+
+        # Rebinding moves the right argument to the new context
+        self.ctx.undefined = 1
+        self.prepare("x or undefined")
+        other = Context({'x': 0, 'undefined': 2})
+        self.obs.bind_ctx(other)
+        self.ctx.undefined = 3
+        assert len(self.t.events) == 0
+        assert self.obs.eval(force_cache_refresh=True) == 2
+        other.undefined = 4
+        self.exec_test(4)
+
+    def test_context_dependencies(self):
+        self.ctx.x = 0
+        self.ctx.y = 0
+        self.prepare("x + y")
+        other, _ = exp.parse("z")
+        other.bind_ctx(self.ctx)
+        other.bind_ctx(self.ctx)
+        assert sorted(self.ctx._watchers.keys()) == ['x', 'y', 'z']
+        assert len(self.ctx._watchers['z']) == 1
+
+        with batch():
+            self.ctx.x = 1
+            self.ctx.y = 2
+            self.ctx.x = 3
+        assert len(self.t.events) == 1
+        assert self.obs.value == 5
+
+        with patch.object(exp.IdentNode, '_context_change') as context_change:
+            node, _ = exp.parse("a")
+            node.bind_ctx(self.ctx)
+            self.ctx.x = 1
+            self.ctx.a = 2
+            assert context_change.call_count == 1
+
+    def test_incremental_comprehension(self):
+        calls = []
+
+        def tracked(val):
+            calls.append(val)
+            return val * 10
+
+        self.ctx.f = tracked
+        self.ctx.lst = [1, 2, 3, 4]
+        self.prepare("[f(x) for x in lst if x % 2 == 0]")
+        assert self.obs.value == [20, 40]
+        del calls[:]
+
+        # Only the new/changed elements are evaluated
+        self.ctx.lst.append(6)
+        self.exec_test([20, 40, 60])
+        assert calls == [6]
+        self.ctx.lst.insert(0, 8)
+        self.ctx.lst.insert(-1, 1)
+        self.ctx.lst[2] = 12
+        assert self.obs.value == [80, 120, 40, 60]
+        assert calls == [6, 8, 12]
+        self.ctx.lst.remove(12)
+        self.ctx.lst.pop(0)
+        self.ctx.lst.pop()
+        self.ctx.lst.reverse()
+        assert self.obs.value == [40]
+        assert calls == [6, 8, 12]
+        self.ctx.lst.extend(val for val in [2, 4])
+        del self.ctx.lst[-2]
+        assert self.obs.value == [40, 40]
+        assert self.ctx.lst == [1, 4, 3, 1, 4]
+        assert calls == [6, 8, 12, 2, 4]
+
+        # Batched changes are replayed as well
+        with batch():
+            self.ctx.lst.append(2)
+            self.ctx.lst.append(3)
+        assert self.obs.value == [40, 40, 20]
+        assert calls == [6, 8, 12, 2, 4, 2]
+
+        # Reordering the list just reorders the value
+        self.ctx.lst.sort(reverse=True)
+        assert self.obs.value == [40, 40, 20]
+        assert calls == [6, 8, 12, 2, 4, 2]
+
+        # Slice assignments and deletions are replayed as well
+        del self.ctx.lst[:2]
+        assert self.obs.value == [20]
+        self.ctx.lst[1:3] = [4, 5, 6]
+        assert self.ctx.lst == [3, 4, 5, 6, 1, 1]
+        assert self.obs.value == [40, 60]
+        self.ctx.lst[::2] = [8, 8, 8]
+        assert self.obs.value == [80, 40, 80, 60, 80]
+        del self.ctx.lst[1::2]
+        assert self.obs.value == [80, 80, 80]
+        assert calls == [6, 8, 12, 2, 4, 2, 4, 6, 8, 8, 8]
+
+        # Other changes cause a recomputation
+        self.ctx.lst = [2]
+        assert self.obs.value == [20]
+        self.ctx.f = lambda val: val
+        assert self.obs.value == [2]
+
+    def test_range_comprehension(self):
+        calls = []
+
+        def tracked(val):
+            calls.append(val)
+            return val * 10
+
+        self.ctx.f = tracked
+        self.ctx.series = ArrayProxy('i', [1, 2, 3, 4])
+        self.prepare("[f(x) for x in series if x % 2 == 0]")
+        assert self.obs.value == [20, 40]
+        del calls[:]
+
+        # Only the items in the changed range are evaluated
+        self.ctx.series[1:3] = [6, 7, 8]
+        self.exec_test([60, 80, 40])
+        assert calls == [6, 8]
+        self.ctx.series.shift([10, 11])
+        assert list(self.ctx.series) == [7, 8, 4, 10, 11]
+        assert self.obs.value == [80, 40, 100]
+        assert calls == [6, 8, 10]
@@ -24,10 +24,67 @@ def test_string_interp():
     assert s.value == "JamesB"
 
 
+def test_shared_template():
+    ctx = Context()
+    ctx.name = "James"
+    s = InterpolatedStr("{literal} 100% {{ name }} }")
+    s.bind_ctx(ctx)
+    assert s.value == "{literal} 100% James }"
 
+    # Clones share the template, but not the expressions
+    clone = s.clone()
+    assert clone._template is s._template
+    assert clone.asts[0] is not s.asts[0]
+    other_ctx = Context()
+    other_ctx.name = "Bond"
+    clone.bind_ctx(other_ctx)
+    assert clone.value == "{literal} 100% Bond }"
+    assert s.value == "{literal} 100% James }"
 
+    # So do strings created from the same source
+    assert InterpolatedStr("{literal} 100% {{ name }} }")._template is s._template
 
 
+def test_reevaluate_changed():
+    ctx = Context()
+    calls = []
+
+    def upper(val):
+        calls.append(val)
+        return val.upper()
+    ctx.upper = upper
+    ctx.name = "james"
+    ctx.surname = "bond"
+    s = InterpolatedStr("{{ upper(name) }} {{ surname }}")
+    s.bind_ctx(ctx)
+    assert s.value == "JAMES bond"
+    calls.clear()
 
+    # Only the expressions which changed are reevaluated
+    ctx.surname = "smith"
+    assert s.value == "JAMES smith"
+    assert calls == []
+    ctx.name = "john"
+    assert s.value == "JOHN smith"
+    assert calls == ["john"]
 
 
+def test_empty_interpolation():
+    s = InterpolatedStr("a {{ }} b")
+    s.bind_ctx(Context())
+    assert s.value == "a None b"
+
+
+def test_unprintable_value():
+    class Unprintable:
+        def __str__(self):
+            raise ValueError("Unprintable")
+
+    ctx = Context()
+    ctx.a = 1
+    ctx.b = Unprintable()
+    s = InterpolatedStr("{{ a }}-{{ b }}")
+    s.bind_ctx(ctx)
+    assert s.value == "1-"
+    ctx.a = Unprintable()
+    assert s.value == "-"
@@ -1,3 +1,7 @@
+from unittest.mock import patch
+
+import pytest
+
 import src.circular.template.observer as o
 from tests.utils import TObserver
 
@@ -70,3 +74,211 @@ def test_list_observer():
     }
 
 
+def test_slice_events():
+    l = o.ListProxy([0, 1, 2, 3, 4])
+    t = TObserver(o.observe(l))
+
+    l[1:3] = ['a', 'b', 'c']
+    assert l == [0, 'a', 'b', 'c', 3, 4]
+    assert t.events.pop().data == {
+        'observed_obj':l,
+        'type':'range',
+        'start':1,
+        'stop':3,
+        'values':['a', 'b', 'c'],
+        'old':[1, 2],
+    }
+
+    del l[-2:]
+    assert l == [0, 'a', 'b', 'c']
+    assert t.events.pop().data == {
+        'observed_obj':l,
+        'type':'range',
+        'start':4,
+        'stop':6,
+        'values':[],
+        'old':[3, 4],
+    }
+
+    del l[::2]
+    assert l == ['a', 'c']
+    data = t.events.pop().data
+    assert data['type'] == 'batch'
+    assert [(ev['type'], ev['key'], ev['old']) for ev in data['events']] == [('__delitem__', 2, 'b'), ('__delitem__', 0, 0)]
+    assert t.events == []
+
+
+def test_permutation_events():
+    l = o.ListProxy([3, 1, 2, 1])
+    t = TObserver(o.observe(l))
+
+    l.sort()
+    assert l == [1, 1, 2, 3]
+    assert t.events.pop().data == {
+        'observed_obj':l,
+        'type':'sort',
+        'permutation':[1, 3, 2, 0],
+    }
+
+    l.sort(key=lambda x: -x)
+    assert l == [3, 2, 1, 1]
+    assert t.events.pop().data['permutation'] == [3, 2, 0, 1]
+
+    l.reverse()
+    assert l == [1, 1, 2, 3]
+    assert t.events.pop().data['permutation'] == [3, 2, 1, 0]
+
+    # The key is called once per item and the list is reordered by the permutation
+    keys = iter([2, 0, 3, 1])
+    calls = []
+
+    def key(item):
+        calls.append(item)
+        return next(keys)
+
+    before = list(l)
+    l.sort(key=key, reverse=True)
+    assert calls == before
+    permutation = t.events.pop().data['permutation']
+    assert permutation == [2, 0, 3, 1]
+    assert l == [before[index] for index in permutation]
+
+def test_array_proxy():
+    a = o.ArrayProxy('d', [0, 1, 2, 3])
+    t = TObserver(o.observe(a))
+
+    def last_range():
+        data = t.events.pop().data
+        assert data['observed_obj'] is a
+        assert data['type'] == 'range'
+        return (data['start'], data['stop'], list(data['values']))
+
+    a[1] = 5
+    assert last_range() == (1, 2, [5.0])
+    a[-3:] = [7, 8]
+    assert last_range() == (1, 4, [7.0, 8.0])
+    assert list(a) == [0.0, 7.0, 8.0]
+    a.append(9)
+    assert last_range() == (3, 3, [9.0])
+    a.extend(x for x in [10, 11])
+    assert last_range() == (4, 4, [10.0, 11.0])
+    a.insert(-10, -1)
+    assert last_range() == (0, 0, [-1.0])
+    assert a.pop() == 11.0
+    assert last_range() == (6, 7, [])
+    a.remove(7)
+    assert last_range() == (2, 3, [])
+    del a[:3]
+    assert last_range() == (0, 3, [])
+    assert list(a) == [9.0, 10.0]
+
+    a.shift([12, 13, 14])
+    assert list(a) == [13.0, 14.0]
+    data = t.events.pop().data
+    assert data['type'] == 'batch'
+    assert [(ev['start'], ev['stop'], list(ev['values'])) for ev in data['events']] == [(0, 2, []), (0, 0, [13.0, 14.0])]
+
+    a[::2] = [1]
+    assert list(a) == [1.0, 14.0]
+    assert last_range() == (0, 1, [1.0])
+    assert t.events == []
+
+    # Extended slices must be assigned the same number of items
+    with pytest.raises(ValueError):
+        a[::-1] = [2, 3, 4]
+    assert list(a) == [1.0, 14.0]
+    assert t.events == []
+
+def test_observable_class_cache():
+    objs = [MockObj(i) for i in range(3)]
+    for obj in objs:
+        o.observe(obj)
+    assert type(objs[0]) is type(objs[1]) is type(objs[2])
+    assert type(objs[0]).__name__ == 'ObservableMockObj'
+    assert objs[0]._orig_class is MockObj
+
+    lst = o.ListProxy([])
+    o.observe(lst)
+    assert type(lst) is o.observable_class(o.ArrayMixin, o.ListProxy)
+    assert type(lst) is not type(objs[0])
+
+def test_lazy_proxies():
+    raw_inner = [1, 2]
+    raw = {'lst': [raw_inner, {'a': 1}], 'd': {'b': [3]}}
+    d = o.DictProxy(raw)
+
+    # Nothing is wrapped (or copied) before it is accessed
+    assert dict.__getitem__(d, 'lst') is raw['lst']
+    lst = d['lst']
+    assert isinstance(lst, o.ListProxy)
+    assert d['lst'] is lst
+    assert list.__getitem__(lst, 0) is raw_inner
+
+    # Accessing nested items wraps them
+    assert isinstance(lst[0], o.ListProxy)
+    assert lst[0] is lst[0]
+    assert [type(item) for item in lst] == [o.ListProxy, o.DictProxy]
+    assert [type(item) for item in lst[0:1]] == [o.ListProxy]
+    assert all(type(val) in [o.ListProxy, o.DictProxy] for val in d.values())
+    assert d == raw
+
+    # Wrapped items can be observed
+    obs = o.observe(lst[1])
+    t = TObserver(obs)
+    lst[1]['a'] = 2
+    assert t.events.pop().data['value'] == 2
+
+    # Raw containers added later are wrapped when accessed
+    lst.append([4])
+    assert [type(item) for item in lst][-1] is o.ListProxy
+    assert isinstance(lst.pop(), o.ListProxy)
+    assert isinstance(d.pop('d'), o.DictProxy)
+
+def test_batch():
+    l = o.ListProxy([1, 2])
+    m = MockObj(10)
+    tl = TObserver(o.observe(l))
+    tm = TObserver(o.observe(m))
+
+    with o.batch():
+        l.append(3)
+        with o.batch():
+            l.pop(0)
+            m.v = 20
+        assert tl.events == [] and tm.events == []
+    assert len(tl.events) == 1 and len(tm.events) == 1
+    data = tl.events.pop().data
+    assert data['type'] == 'batch'
+    assert data['observed_obj'] is l
+    assert [event['type'] for event in data['events']] == ['append', '__delitem__']
+    # Single changes are delivered unchanged
+    assert tm.events.pop().data['type'] == '__setattr__'
+
+    try:
+        with o.batch():
+            l.append(4)
+            raise ValueError()
+    except ValueError:
+        pass
+    assert tl.events.pop().data['type'] == 'append'
+    l.append(5)
+    assert tl.events.pop().data['value'] == 5
+
+def test_no_listeners():
+    l = o.ListProxy([1, 2])
+    d = o.DictProxy({'a': 1})
+    m = MockObj(1)
+    obs = [o.observe(l), o.observe(d), o.observe(m)]
+    with patch.object(o, '_emit_change') as emit_change:
+        l.append(3)
+        l[0] = 0
+        l.pop()
+        d['b'] = 2
+        m.v = 2
+        assert emit_change.call_count == 0
+        t = TObserver(obs[0])
+        l.append(4)
+        assert emit_change.call_count == 1
+    assert l == [0, 2, 4] and d == {'a': 1, 'b': 2} and m.v == 2
+    l.append(5)
+    assert t.events.pop().data['value'] == 5
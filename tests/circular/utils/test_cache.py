@@ -0,0 +1,41 @@
+from src.circular.utils.cache import LRUCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert 'b' not in cache
+    assert 'a' in cache
+    assert 'c' in cache
+    assert len(cache) == 2
+
+    cache.resize(1)
+    assert 'a' not in cache
+    assert cache.get('c') == 3
+    assert cache.get('b', 'default') == 'default'
+    assert cache.stats() == {
+        'hits': 2,
+        'misses': 1,
+        'evictions': 2,
+        'size': 1,
+        'maxsize': 1,
+    }
+
+    cache.clear(reset_stats=True)
+    assert len(cache) == 0
+    assert cache.stats()['hits'] == 0
+
+
+def test_lru_unbounded_and_disabled():
+    cache = LRUCache()
+    for i in range(100):
+        cache[i] = i
+    assert len(cache) == 100
+    assert cache.stats()['evictions'] == 0
+
+    cache = LRUCache(maxsize=0)
+    cache['a'] = 1
+    assert 'a' not in cache
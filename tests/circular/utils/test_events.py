@@ -0,0 +1,97 @@
+import gc
+
+from src.circular.utils.events import Event, EventMixin, WeakHandler
+
+
+class Listener(object):
+    def __init__(self):
+        self.events = []
+
+    def handler(self, event):
+        self.events.append(event.data)
+
+
+def test_weak_bind():
+    emitter = EventMixin()
+    listener = Listener()
+    subscription = emitter.bind('change', listener.handler, weak=True)
+    assert isinstance(subscription.handler, WeakHandler)
+    assert emitter.is_bound('change', listener.handler)
+    emitter.emit('change', 1)
+    assert listener.events == [1]
+
+    # Dead listeners are pruned automatically
+    del listener
+    gc.collect()
+    assert not emitter.has_listeners('change')
+
+    # Weakly bound handlers can be unbound using the method
+    listener = Listener()
+    emitter.bind('change', listener.handler, weak=True)
+    emitter.unbind('change', listener.handler)
+    assert not emitter.has_listeners('change')
+
+    # Functions are always bound strongly
+    events = []
+    emitter.bind('change', lambda event: events.append(event.data), weak=True)
+    gc.collect()
+    emitter.emit('change', 2)
+    assert events == [2]
+
+
+def test_lean_bind():
+    emitter = EventMixin()
+    received = []
+    emitter.bind('change', received.append, lean=True)
+    last_id = Event._lastid
+    emitter.emit('change', {'value': 1})
+    assert received == [{'value': 1}]
+
+    # No Event object is created when all handlers are lean
+    assert Event._lastid == last_id
+
+    # Lean and ordinary handlers can be mixed
+    listener = Listener()
+    emitter.bind('change', listener.handler)
+    emitter.emit('change', 2)
+    assert received == [{'value': 1}, 2]
+    assert listener.events == [2]
+
+    # Forwarded events are delivered to lean handlers as data
+    target = EventMixin()
+    forwarded = []
+    target.bind('forwarded', forwarded.append, lean=True)
+    emitter.bind('change', target, 'forwarded')
+    emitter.emit('change', 3)
+    assert forwarded == [3]
+
+
+def test_subscription():
+    emitter = EventMixin()
+    events = []
+    first = emitter.bind('change', lambda event: events.append(('first', event.data)))
+    second = emitter.bind('change', lambda event: events.append(('second', event.data)))
+    assert first.active and second.active
+
+    first.unbind()
+    assert not first.active
+    emitter.emit('change', 1)
+    assert events == [('second', 1)]
+
+    # Unbinding twice does nothing
+    first.unbind()
+    assert emitter.has_listeners('change')
+
+    # Unbinding all handlers deactivates the subscriptions
+    emitter.unbind()
+    assert not second.active
+    second.unbind()
+
+    # Handlers unbound during an emit are still called for that emit
+    calls = []
+    third = emitter.bind('change', lambda event: calls.append('third'))
+    emitter.bind('change', lambda event: (calls.append('fourth'), third.unbind()))
+    emitter.bind('change', lambda event: calls.append('fifth'))
+    emitter.emit('change')
+    emitter.emit('change')
+    assert calls == ['third', 'fourth', 'fifth', 'fourth', 'fifth']